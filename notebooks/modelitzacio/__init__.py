@@ -0,0 +1,22 @@
+"""
+Eines de suport per als notebooks de simulació d'esdeveniments discrets
+"""
+from .recorder import Recorder
+from .replication import replicate, replicate_until, run_replications, summary
+from . import models
+from .monitor import ResourceMonitor, Tally, TimeWeighted
+from .variates import Streams, VariateStream
+from .tracer import Tracer
+from .jobshop import JobShop
+from .workshop import Workshop
+from .resources import ResourceSet
+from .steady import batch_means, mser, run_until_precision
+from .crn import compare, paired_difference
+from .sweep import grid, kim_nelson, sweep
+from .checkpoint import branch, resume, run_with_checkpoints
+from . import analytic
+from .eventlog import EventLog, open_log, run_logged
+from .entities import EntityStore
+from .calqueue import CalendarEnvironment, CalendarQueue
+from . import markov
+from . import ctmc
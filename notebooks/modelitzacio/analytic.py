@@ -0,0 +1,217 @@
+"""
+Resultats analítics de teoria de cues per als mateixos models que es simulen.
+
+- `taquilles`: la venda per taquilla amb arribades de Poisson i servei
+  exponencial és una cua M/M/c, i la fórmula d'Erlang C en dona els
+  indicadors estacionaris exactes.
+- `fabrica`: la fàbrica es tracta com una xarxa de Jackson oberta; cada
+  estació és una cua M/M/c corregida amb l'aproximació d'Allen-Cunneen
+  perquè els serveis són Erlang.
+- `mva`: anàlisi de valors mitjans per a xarxes tancades (un nombre fix
+  d'encàrrecs a la fàbrica).
+
+Les funcions reben els mateixos paràmetres que els models de simulació
+(sense el generador) i retornen els mateixos noms d'indicadors, amb els
+camps `estable` i `exacte` que indiquen si se'n compleixen els supòsits.
+Els resultats són estacionaris: el camp `estacionari` indica si una
+simulació de durada `temps` que comença buida hi arriba. Prop de la
+saturació no hi arriba: a la fàbrica per defecte l'estació 1 treballa a
+rho = 0.99 i, en un `ANY`, la simulació dona una espera de 14.5 ± 2.1 i
+una cua a l'estació 1 de 25.2 ± 6.1, davant de 30.5 i 75.3 analítics.
+Amb `screen` es poden avaluar milers de configuracions i enviar a simular
+només les més prometedores.
+"""
+import math
+
+import pandas as pd
+
+from .models import ANY, FABRICA
+
+
+def erlang_c(a, c):
+    """
+    Probabilitat d'esperar en una cua M/M/c amb càrrega `a` = lambda / mu
+
+    Es calcula a partir de la recurrència d'Erlang B, que és estable
+    numèricament per a molts servidors.
+    """
+    if a >= c:
+        return 1.0
+    b = 1.0
+    for k in range(1, c + 1):
+        b = a * b / (k + a * b)
+    return c * b / (c - a * (1 - b))
+
+
+def mmc(lam, mean, c):
+    """
+    Indicadors estacionaris d'una cua M/M/c
+
+    `lam` és la taxa d'arribades i `mean` el temps mitjà de servei.
+    Retorna la probabilitat d'esperar, l'espera mitjana, la cua mitjana
+    (sense els que són atesos) i l'ocupació.
+    """
+    a = lam * mean
+    rho = a / c
+    if rho >= 1:
+        return {"p_espera": 1.0, "espera": math.inf, "cua": math.inf, "ocupacio": 1.0}
+    p = erlang_c(a, c)
+    wq = p * mean / (c - a)
+    return {"p_espera": p, "espera": wq, "cua": lam * wq, "ocupacio": rho}
+
+
+def relaxacio(mean, c, rho):
+    """
+    Temps de relaxació d'una cua amb `c` servidors i ocupació `rho`
+
+    Aproximació de Morse per a la M/M/1, amb un servidor c vegades més
+    ràpid: mean / c / (1 - sqrt(rho))². Una simulació que comença buida
+    necessita uns quants temps de relaxació per arribar al règim
+    estacionari, i aquest temps creix sense límit quan rho s'acosta a 1.
+    """
+    if rho >= 1:
+        return math.inf
+    return mean / c / (1 - math.sqrt(rho)) ** 2
+
+
+def _estacionari(temps, relax):
+    """
+    Cert si un horitzó `temps` (None: infinit) és llarg respecte de la relaxació
+    """
+    return temps is None or temps >= 10 * relax
+
+
+def taquilles(n_taquilles=2, temps=None, arribades=8, servei=10, **kwargs):
+    """
+    Venda per taquilla com a cua M/M/c (Erlang C)
+
+    Els indicadors són els de `models.taquilles` en règim estacionari: `cua`
+    és el nombre mitjà de persones al sistema. Una simulació curta que
+    comença amb la cua buida en dona valors més baixos: `estacionari` és
+    fals si `temps` no arriba a deu temps de relaxació.
+    """
+    lam = 1 / arribades
+    r = mmc(lam, servei, n_taquilles)
+    relax = relaxacio(servei, n_taquilles, r["ocupacio"])
+    return {
+        "cua": r["cua"] + lam * servei if r["cua"] != math.inf else math.inf,
+        "espera": r["espera"],
+        "ocupacio": r["ocupacio"],
+        "p_espera": r["p_espera"],
+        "estable": r["ocupacio"] < 1,
+        "estacionari": _estacionari(temps, relax),
+        "exacte": True,
+    }
+
+
+def _visites(fabrica):
+    """
+    Taxa d'arribades, temps mitjà de servei i SCV del servei de cada estació
+    """
+    n = len(fabrica["estacions"])
+    lam = 1 / fabrica["arribades"]
+    k = fabrica["k"]
+    taxa = [0.0] * n
+    m1 = [0.0] * n
+    m2 = [0.0] * n
+    for p in fabrica["productes"].values():
+        for s, t in zip(p["ruta"], p["temps"]):
+            w = lam * p["p"]
+            taxa[s - 1] += w
+            m1[s - 1] += w * t
+            # Moment de segon ordre d'una Erlang(k) de mitjana t
+            m2[s - 1] += w * t * t * (1 + 1 / k)
+    mean = [m / l if l else 0.0 for m, l in zip(m1, taxa)]
+    scv = [m / l / (e * e) - 1 if l else 1.0 for m, l, e in zip(m2, taxa, mean)]
+    return taxa, mean, scv
+
+
+def fabrica(temps=ANY, fabrica=FABRICA, **kwargs):
+    """
+    Fàbrica com a xarxa de Jackson oberta amb la correcció d'Allen-Cunneen
+
+    L'espera de cada estació és la d'una M/M/c multiplicada per
+    (ca² + cs²) / 2, amb ca² = 1 (arribades de Poisson) i cs² el coeficient
+    de variació quadrat del servei barrejat de tots els productes.
+
+    Tots els indicadors són estacionaris; `temps` només fixa el nombre
+    d'`encarrecs` (amb `temps=None`, per unitat de temps) i el camp
+    `estacionari`. Prop de la saturació una simulació de durada `temps`
+    queda molt per sota dels valors analítics (vegeu `relaxacio`).
+    """
+    taxa, mean, scv = _visites(fabrica)
+    n = len(fabrica["estacions"])
+    espera_est, cua, ocupacio = [], [], []
+    relax = 0.0
+    for s in range(n):
+        if taxa[s] == 0:
+            espera_est.append(0.0)
+            cua.append(0.0)
+            ocupacio.append(0.0)
+            continue
+        r = mmc(taxa[s], mean[s], fabrica["estacions"][s])
+        wq = r["espera"] * (1 + scv[s]) / 2
+        espera_est.append(wq)
+        cua.append(taxa[s] * wq)
+        ocupacio.append(r["ocupacio"])
+        relax = max(relax, relaxacio(mean[s], fabrica["estacions"][s], r["ocupacio"]))
+
+    out = {}
+    lam = 1 / fabrica["arribades"]
+    out["espera"] = sum(p["p"] * sum(espera_est[s - 1] for s in p["ruta"])
+                        for p in fabrica["productes"].values())
+    out["encarrecs"] = lam * (1.0 if temps is None else temps)
+    for nom, p in fabrica["productes"].items():
+        out["espera_" + nom] = sum(espera_est[s - 1] for s in p["ruta"])
+    for nom, p in fabrica["productes"].items():
+        for s, t in zip(p["ruta"], p["temps"]):
+            out["servei_{}_{}".format(nom, s)] = t
+    for s in range(n):
+        out["cua_{}".format(s + 1)] = cua[s]
+        out["ocupacio_{}".format(s + 1)] = ocupacio[s]
+        out["espera_est_{}".format(s + 1)] = espera_est[s]
+    out["estable"] = all(u < 1 for u in ocupacio)
+    out["estacionari"] = _estacionari(temps, relax)
+    out["exacte"] = all(abs(v - 1) < 1e-12 for v, l in zip(scv, taxa) if l)
+    return out
+
+
+def mva(demandes, servidors, n):
+    """
+    Anàlisi de valors mitjans d'una xarxa tancada amb `n` encàrrecs
+
+    `demandes[s]` és el temps total de servei que un encàrrec necessita a
+    l'estació s (visites x temps mitjà) i `servidors[s]` el nombre de
+    màquines. Les estacions amb diverses màquines es tracten amb
+    l'aproximació de Seidmann: una màquina c vegades més ràpida més un
+    retard fix. Retorna el rendiment (encàrrecs per unitat de temps), el
+    temps de cicle i el nombre mitjà d'encàrrecs a cada estació (llei de
+    Little sobre tot el temps de residència, retard inclòs).
+    """
+    m = len(demandes)
+    d_cua = [d / c for d, c in zip(demandes, servidors)]
+    d_retard = [d * (c - 1) / c for d, c in zip(demandes, servidors)]
+    q = [0.0] * m
+    x = 0.0
+    r = [0.0] * m
+    for k in range(1, n + 1):
+        r = [dq * (1 + qs) + dr for dq, dr, qs in zip(d_cua, d_retard, q)]
+        x = k / sum(r)
+        q = [x * dq * (1 + qs) for dq, qs in zip(d_cua, q)]
+    return {"rendiment": x, "cicle": sum(r), "cua": [x * rs for rs in r],
+            "ocupacio": [x * d / c for d, c in zip(demandes, servidors)]}
+
+
+def screen(model, configs, kpi, keep=10, minimize=True, **fixed):
+    """
+    Avalua analíticament totes les configuracions i en tria les `keep` millors
+
+    Les configuracions inestables queden al final. Retorna la taula de
+    resultats ordenada i el diccionari de configuracions triades, que es pot
+    passar directament a `kim_nelson` o a `sweep`.
+    """
+    rows = {name: model(**{**fixed, **kw}) for name, kw in configs.items()}
+    table = pd.DataFrame(rows).T
+    table = table.sort_values(["estable", kpi], ascending=[False, minimize])
+    best = list(table.index[:keep])
+    return table, {name: configs[name] for name in best}
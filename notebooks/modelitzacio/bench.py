@@ -0,0 +1,299 @@
+"""
+Bancs de proves dels motors de simulació.
+
+Per a cada model (venda per taquilla, fàbrica de cinc estacions i taller
+amb operaris i reparacions), cada motor, cada nivell d'utilització i cada
+horitzó es mesuren el temps d'execució, els esdeveniments processats per
+segon i la memòria màxima. Els resultats es desen en JSON per poder
+comparar dues versions del codi:
+
+    python -m modelitzacio.bench -o abans.json
+    ...
+    python -m modelitzacio.bench -o despres.json --compare abans.json
+
+Els esdeveniments de simpy són els que processa l'`Environment` (`step`);
+els de la fàbrica amb el motor propi, arribades i sortides de les
+estacions; els del taller, arribades i finals de cada fase; els de les
+recurrències de Lindley, una arribada i una sortida per client.
+"""
+import argparse
+import datetime
+from functools import partial
+from heapq import heappop, heappush
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import simpy
+
+from . import jobshop, lindley, models, workshop
+from .analytic import _visites
+from .calqueue import CalendarQueue
+
+RHO = (0.5, 0.8, 0.95)
+
+
+class _Counting(simpy.Environment):
+    """
+    `simpy.Environment` que compta els esdeveniments processats
+    """
+
+    def __init__(self, initial_time=0):
+        super().__init__(initial_time)
+        self.events = 0
+
+    def step(self):
+        super().step()
+        self.events += 1
+
+
+def _simpy(model, **fixed):
+    """
+    Motor simpy: els models es creen amb un `_Counting` (paràmetre `entorn`)
+    """
+    def run(seeds, **kwargs):
+        envs = []
+
+        def entorn():
+            env = _Counting()
+            envs.append(env)
+            return env
+        for seed in seeds:
+            model(np.random.default_rng(seed), entorn=entorn, **fixed, **kwargs)
+        return sum(env.events for env in envs)
+    return run
+
+
+def _jobshop(seeds, temps, calendari=False, **kwargs):
+    events = 0
+    for seed in seeds:
+        shop = jobshop.JobShop(rng=np.random.default_rng(seed), **kwargs,
+                               calendar=CalendarQueue() if calendari else None)
+        shop.run(temps)
+        shop.report()
+        events += shop.events
+    return events
+
+
+def _workshop(seeds, temps, calendari=False, **kwargs):
+    events = 0
+    for seed in seeds:
+        shop = workshop.Workshop(rng=np.random.default_rng(seed), **kwargs,
+                                 calendar=CalendarQueue() if calendari else None)
+        shop.run(temps)
+        shop.report()
+        events += shop.events
+    return events
+
+
+def _lindley(seeds, **kwargs):
+    # Totes les rèpliques en una sola crida vectoritzada
+    runs = lindley.taquilles(np.random.default_rng(seeds[0]), len(seeds), **kwargs)
+    return 2 * int(runs["clients"].sum())
+
+
+def _taquilles(rho, n_taquilles=2, servei=10):
+    return dict(n_taquilles=n_taquilles, servei=servei,
+                arribades=servei / (n_taquilles * rho))
+
+
+def _fabrica(rho, fabrica=models.FABRICA):
+    # S'escalen les arribades perquè l'estació coll d'ampolla tingui utilització rho
+    taxa, mean, _ = _visites(fabrica)
+    util = max(l * m / c for l, m, c in zip(taxa, mean, fabrica["estacions"]))
+    return dict(fabrica={**fabrica, "arribades": fabrica["arribades"] * util / rho})
+
+
+def _taller(rho, n_maquines=5, n_operaris=3, proces=60, preparacio=20, reparacio=30,
+            p_reparacio=0.2):
+    # La màquina es reté durant tota la tasca; els operaris, a la preparació i la reparació
+    maquina = (preparacio + proces + p_reparacio * reparacio) / n_maquines
+    operari = (preparacio + 2 * p_reparacio * reparacio) / n_operaris
+    return dict(n_maquines=n_maquines, n_operaris=n_operaris,
+                arribades=max(maquina, operari) / rho)
+
+
+# model -> (horitzó base, paràmetres per a una utilització, motors)
+CASES = {
+    "taquilles": (10**4, _taquilles,
+                  {"simpy": _simpy(models.taquilles),
+                   "lindley": _lindley}),
+    "fabrica": (models.ANY, _fabrica,
+                {"simpy": _simpy(models.fabrica),
+                 "jobshop": _jobshop,
+                 "jobshop-cal": partial(_jobshop, calendari=True)}),
+    "taller": (7 * 24 * 60, _taller,
+               {"simpy": _simpy(models.taller),
+                "workshop": _workshop,
+                "workshop-cal": partial(_workshop, calendari=True)}),
+}
+
+
+def hold(sizes=(10**2, 10**4, 10**5, 10**6, 3 * 10**6), ops=200000, seed=1, verbose=True):
+    """
+    Model "hold" de calendaris: microsegons per parella (treure, afegir)
+
+    Amb `n` esdeveniments pendents es treu el primer i se n'afegeix un altre
+    a un temps exponencial més tard, com fa una simulació en règim
+    estacionari. Es compara el heap binari (`heapq`) amb `CalendarQueue`.
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for n in sizes:
+        inc = rng.exponential(1.0, ops).tolist()
+        items = [(t, i) for i, t in enumerate(rng.exponential(1.0, n).tolist())]
+        heap = sorted(items)
+        cal = CalendarQueue()
+        for item in items:
+            cal.push(item)
+        for name, push, pop, queue in [("heapq", heappush, heappop, heap),
+                                       ("calendari", CalendarQueue.push, CalendarQueue.pop,
+                                        cal)]:
+            seq = n
+            t0 = time.perf_counter()
+            for x in inc:
+                t, _ = pop(queue)
+                push(queue, (t + x, seq))
+                seq += 1
+            us = (time.perf_counter() - t0) / ops * 1e6
+            rows.append({"calendari": name, "pendents": n, "us_op": us})
+            if verbose:
+                print("{:10s} pendents={:<8d} {:7.3f} us".format(name, n, us), flush=True)
+    return pd.DataFrame(rows)
+
+
+def measure(engine, seeds, repeat=3, memory=True, **kwargs):
+    """
+    Millor temps de `repeat` execucions, esdeveniments i memòria màxima (MB)
+
+    La memòria es mesura amb `tracemalloc` en una execució a part, perquè
+    alenteix la simulació.
+    """
+    wall = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        events = engine(seeds, **kwargs)
+        wall = min(wall, time.perf_counter() - t0)
+    peak = np.nan
+    if memory:
+        tracemalloc.start()
+        engine(seeds, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return {"temps_exec": wall, "esdeveniments": events,
+            "esdeveniments_s": events / wall, "memoria_mb": peak}
+
+
+def run(cases=None, rho=RHO, scales=(1, 10), replicas=5, repeat=3, memory=True,
+        seed=1, verbose=True):
+    """
+    Executa els bancs de proves i en retorna una fila per cas
+    """
+    if cases is None:
+        cases = list(CASES)
+    seeds = np.random.SeedSequence(seed).spawn(replicas)
+    rows = []
+    for name in cases:
+        base, params, engines = CASES[name]
+        for r in rho:
+            for scale in scales:
+                for engine, func in engines.items():
+                    row = {"model": name, "motor": engine, "rho": r,
+                           "temps": base * scale, "repliques": replicas}
+                    row.update(measure(func, seeds, repeat, memory,
+                                       temps=base * scale, **params(r)))
+                    rows.append(row)
+                    if verbose:
+                        print("{model:10s} {motor:12s} rho={rho:<5} temps={temps:<10g} "
+                              "{temps_exec:8.3f} s {esdeveniments_s:12.0f} esd/s "
+                              "{memoria_mb:8.2f} MB".format(**row), flush=True)
+    return pd.DataFrame(rows)
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save(results, path, calendars=None):
+    """
+    Desa els resultats en JSON amb la versió del codi i de l'entorn
+
+    `calendars` són els resultats opcionals de `hold`.
+    """
+    data = {
+        "data": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "simpy": simpy.__version__,
+        "maquina": platform.platform(),
+        # to_json escriu els NaN com a null, que és JSON vàlid
+        "resultats": json.loads(results.to_json(orient="records")),
+    }
+    if calendars is not None:
+        data["calendaris"] = calendars.to_dict(orient="records")
+    with open(path, "w") as f:
+        json.dump(data, f, indent=1)
+
+
+def load(path):
+    """
+    Llegeix uns resultats desats amb `save`
+    """
+    with open(path) as f:
+        return pd.DataFrame(json.load(f)["resultats"])
+
+
+def compare(old, new, tolerance=0.1):
+    """
+    Relació d'esdeveniments per segon entre dues execucions
+
+    La columna `regressio` marca els casos que són més d'un `tolerance`
+    (en tant per u) més lents que abans.
+    """
+    keys = ["model", "motor", "rho", "temps"]
+    df = old.merge(new, on=keys, suffixes=("_abans", "_ara"))
+    df["relacio"] = df["esdeveniments_s_ara"] / df["esdeveniments_s_abans"]
+    df["regressio"] = df["relacio"] < 1 - tolerance
+    return df[keys + ["esdeveniments_s_abans", "esdeveniments_s_ara", "relacio", "regressio"]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m modelitzacio.bench",
+                                     description="Bancs de proves dels motors de simulació")
+    parser.add_argument("-o", "--output", default="bench.json", help="fitxer JSON de resultats")
+    parser.add_argument("--models", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--rho", nargs="+", type=float, default=list(RHO))
+    parser.add_argument("--scales", nargs="+", type=float, default=[1, 10],
+                        help="multiplicadors de l'horitzó base de cada model")
+    parser.add_argument("--replicas", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="no mesura la memòria")
+    parser.add_argument("--compare", help="resultats anteriors per detectar regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    parser.add_argument("--hold", action="store_true",
+                        help="compara també heapq i la cua de calendari amb el model hold")
+    args = parser.parse_args(argv)
+
+    results = run(args.models, args.rho, args.scales, args.replicas, args.repeat,
+                  not args.no_memory)
+    calendars = hold() if args.hold else None
+    save(results, args.output, calendars)
+    if args.compare:
+        diff = compare(load(args.compare), results, args.tolerance)
+        print(diff.to_string(index=False))
+        if diff["regressio"].any():
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,208 @@
+"""
+Calendari d'esdeveniments en forma de cua de calendari (Brown, 1988).
+
+El temps es divideix en `nb` dies de durada `width` que es repeteixen
+cíclicament com els dies d'un any. Cada esdeveniment va al dia que li
+correspon, en un heap curt, i per treure el següent només cal avançar
+pels dies des de l'últim esdeveniment tret. Quan el nombre
+d'esdeveniments creix o decreix molt, el calendari es redimensiona i
+s'estima una nova durada del dia a partir de les separacions entre els
+primers esdeveniments, de manera que cada operació té un cost amortitzat
+O(1), independent del nombre d'esdeveniments pendents.
+
+Els elements són tuples que comencen pel temps, com les del heap de simpy
+o de `JobShop`. `push` i `pop` tenen la signatura de `heappush` i
+`heappop`, i `queue[0]` és el primer element:
+
+    q = CalendarQueue()
+    push(q, (t, seq, kind, job))
+    t, seq, kind, job = pop(q)
+
+`CalendarEnvironment` és un `simpy.Environment` amb aquest calendari.
+
+Escrita en Python, la cua de calendari només guanya el heap binari de
+`heapq` (escrit en C) amb milions d'esdeveniments pendents (vegeu
+`bench.hold`). Els models del curs en tenen pocs centenars com a molt, i
+per això el heap és el calendari per defecte; `JobShop` i `Workshop`
+accepten una cua de calendari amb el paràmetre `calendar`.
+"""
+from heapq import heapify, heappop, heappush, nsmallest
+
+import simpy
+from simpy.core import EmptySchedule, Infinity, StopSimulation
+from simpy.events import NORMAL
+
+
+class CalendarQueue:
+    """
+    Cua de prioritat de tuples (temps, ...) amb cost amortitzat O(1)
+
+    Cada dia és un heap petit (`heapq`), de manera que afegir i treure un
+    element del dia no mou la resta d'elements del dia.
+    """
+
+    def __init__(self, width=1.0, buckets=16):
+        self._min_buckets = buckets
+        self._buckets = [[] for _ in range(buckets)]
+        self._size = 0
+        self._set_width(width)
+        self._set_limits()
+        # Dia absolut (int(t / width)) de l'últim element tret
+        self._day = 0
+
+    def _set_width(self, width):
+        self.width = width
+        self._inv = 1.0 / width
+
+    def _set_limits(self):
+        # Mides a partir de les quals es redimensiona el calendari
+        nb = len(self._buckets)
+        self._grow = 2 * nb
+        self._shrink = nb // 2 if nb > self._min_buckets else -1
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    def __iter__(self):
+        for b in self._buckets:
+            yield from b
+
+    def push(self, item):
+        """
+        Afegeix un element
+        """
+        day = int(item[0] * self._inv)
+        buckets = self._buckets
+        heappush(buckets[day % len(buckets)], item)
+        if day < self._day:
+            self._day = day
+        self._size += 1
+        if self._size > self._grow:
+            self._resize(2 * len(buckets))
+
+    def _find(self):
+        """
+        Dia del primer element (l'últim dia visitat es desa a `_day`)
+        """
+        buckets = self._buckets
+        nb = len(buckets)
+        inv = self._inv
+        day = self._day
+        for _ in range(nb):
+            b = buckets[day % nb]
+            if b and int(b[0][0] * inv) <= day:
+                self._day = day
+                return b
+            day += 1
+        # Cap element a l'any vinent: cerca directa del mínim
+        item = min(b[0] for b in buckets if b)
+        day = self._day = int(item[0] * inv)
+        return buckets[day % nb]
+
+    def __getitem__(self, i):
+        if i != 0:
+            raise IndexError("només es pot consultar el primer element")
+        if not self._size:
+            raise IndexError("calendari buit")
+        return self._find()[0]
+
+    def pop(self):
+        """
+        Treu i retorna el primer element
+        """
+        buckets = self._buckets
+        day = self._day
+        # Camí ràpid: el primer element és al dia actual
+        b = buckets[day % len(buckets)]
+        if not (b and int(b[0][0] * self._inv) <= day):
+            if not self._size:
+                raise IndexError("calendari buit")
+            b = self._find()
+        item = heappop(b)
+        self._size -= 1
+        if self._size < self._shrink:
+            self._resize(len(buckets) // 2)
+        return item
+
+    def _resize(self, nb):
+        """
+        Reparteix els elements en `nb` dies amb una durada nova
+        """
+        items = list(self)
+        # Durada del dia: tres vegades la separació mitjana entre els primers
+        # elements, sense comptar les separacions anòmalament grans
+        first = [x[0] for x in nsmallest(min(len(items), 25), items)]
+        gaps = [b - a for a, b in zip(first, first[1:])]
+        if gaps:
+            mean = sum(gaps) / len(gaps)
+            small = [g for g in gaps if g <= 2 * mean]
+            width = 3 * sum(small) / len(small) if small else 0.0
+            if width > 0:
+                self._set_width(width)
+        self._buckets = buckets = [[] for _ in range(nb)]
+        inv = self._inv
+        for item in items:
+            buckets[int(item[0] * inv) % nb].append(item)
+        for b in buckets:
+            heapify(b)
+        self._set_limits()
+        self._day = int(first[0] * inv) if first else 0
+
+
+def push(queue, item):
+    """
+    Equivalent de `heappush` per a `CalendarQueue`
+    """
+    queue.push(item)
+
+
+def pop(queue):
+    """
+    Equivalent de `heappop` per a `CalendarQueue`
+    """
+    return queue.pop()
+
+
+class CalendarEnvironment(simpy.Environment):
+    """
+    `simpy.Environment` amb una cua de calendari en lloc del heap binari
+
+    Es pot passar als models amb el paràmetre `entorn`, però només és més
+    ràpid que `simpy.Environment` amb milions d'esdeveniments pendents.
+    """
+
+    def __init__(self, initial_time=0, width=1.0):
+        super().__init__(initial_time)
+        self._queue = CalendarQueue(width)
+
+    def schedule(self, event, priority=NORMAL, delay=0):
+        self._queue.push((self._now + delay, priority, next(self._eid), event))
+
+    def peek(self):
+        if self._queue:
+            return self._queue[0][0]
+        return Infinity
+
+    def step(self):
+        # Igual que `simpy.Environment.step`, traient de la cua de calendari
+        try:
+            self._now, _, _, event = self._queue.pop()
+        except IndexError:
+            raise EmptySchedule from None
+
+        callbacks, event.callbacks = event.callbacks, None
+        try:
+            for callback in callbacks:
+                callback(event)
+        except StopSimulation:
+            event.callbacks = callbacks[callbacks.index(callback) + 1:]
+            self.schedule(event, -1)
+            raise
+
+        if not event._ok and not hasattr(event, "_defused"):
+            exc = type(event._value)(*event._value.args)
+            exc.__cause__ = event._value
+            raise exc
@@ -0,0 +1,114 @@
+"""
+Punts de control per a simulacions llargues.
+
+Els processos de simpy són generadors de Python i no es poden desar, però
+els motors que guarden tot l'estat com a dades (calendari, recursos,
+entitats, fluxos aleatoris i acumuladors), com `JobShop`, sí que es poden
+desar amb `pickle`. Qualsevol objecte amb `run(until)` i `now` serveix.
+
+Els motors així són `JobShop` (la fàbrica) i `Workshop` (el taller). La
+venda per taquilla només existeix com a model de simpy
+(`models.taquilles`) i no es pot continuar des d'un punt de control.
+
+    shop = JobShop(FABRICA, rng)
+    run_with_checkpoints(shop, ANY, every=100, directory="punts")
+    ...
+    shop = resume(latest("punts"), ANY, every=100, directory="punts")
+
+Amb `branch` es poden provar diversos escenaris a partir d'un mateix
+estat ja escalfat, sense repetir l'escalfament.
+"""
+import copy
+import glob
+import os
+import pickle
+
+from .variates import Streams
+
+
+def save(engine, path):
+    """
+    Desa l'estat del motor (s'escriu a un fitxer temporal i es reanomena)
+    """
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(engine, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def load(path):
+    """
+    Recupera un motor desat amb `save`
+    """
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _path(directory, prefix, i):
+    return os.path.join(directory, "{}-{:05d}.pkl".format(prefix, i))
+
+
+def latest(directory=".", prefix="punt"):
+    """
+    Darrer punt de control d'un directori (o None si no n'hi ha cap)
+    """
+    paths = sorted(glob.glob(os.path.join(directory, prefix + "-*.pkl")))
+    return paths[-1] if paths else None
+
+
+def run_with_checkpoints(engine, until, every, directory=".", prefix="punt", keep=None):
+    """
+    Avança el motor fins a `until` desant-ne l'estat cada `every` unitats de temps simulat
+
+    Els punts es numeren correlativament; si el directori ja en té, es
+    continua la numeració. Amb `keep` només es conserven els darrers.
+    Retorna la llista de fitxers desats.
+    """
+    os.makedirs(directory, exist_ok=True)
+    last = latest(directory, prefix)
+    i = int(last[-9:-4]) + 1 if last else 0
+    paths = []
+    while engine.now < until:
+        engine.run(min(engine.now + every, until))
+        path = _path(directory, prefix, i)
+        save(engine, path)
+        paths.append(path)
+        if keep is not None:
+            for old in sorted(glob.glob(os.path.join(directory, prefix + "-*.pkl")))[:-keep]:
+                os.remove(old)
+        i += 1
+    return paths
+
+
+def resume(path, until, every=None, directory=None, prefix="punt", keep=None):
+    """
+    Continua la simulació a partir d'un punt de control
+
+    Si es dona `every`, es continuen desant punts de control.
+    """
+    engine = load(path)
+    if every is None:
+        engine.run(until)
+    else:
+        if directory is None:
+            directory = os.path.dirname(path) or "."
+        run_with_checkpoints(engine, until, every, directory, prefix, keep)
+    return engine
+
+
+def branch(engine, *changes, seed=None):
+    """
+    Còpia independent del motor per provar un escenari
+
+    `changes` són funcions que modifiquen la còpia, per exemple
+    `lambda shop: shop.set_machines(1, 3)` o
+    `lambda shop: shop.set_capacity(operaris=4)`. Sense `seed`, totes les branques
+    continuen amb els mateixos nombres aleatoris (nombres aleatoris comuns);
+    amb `seed` se'n reinicien els fluxos.
+    """
+    new = copy.deepcopy(engine)
+    if seed is not None:
+        new.streams = Streams(seed, antithetic=engine.streams.antithetic)
+    for change in changes:
+        change(new)
+    return new
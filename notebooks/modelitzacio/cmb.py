@@ -0,0 +1,361 @@
+"""
+Simulació paral·lela conservadora de la fàbrica (Chandy-Misra-Bryant).
+
+Les estacions de la fàbrica de la Pràctica 9 només es relacionen a través
+dels encàrrecs que passen d'una a una altra. Cada estació és un procés
+lògic amb el seu propi rellotge, i una font genera les arribades. Els
+processos lògics s'envien missatges amb marca de temps (un encàrrec que
+arriba a l'estació de destinació a l'instant t) i missatges nuls (cap
+encàrrec abans de t). Una estació només processa les arribades anteriors
+al mínim dels rellotges dels seus canals d'entrada, perquè sap que ja no
+en rebrà cap de més antiga.
+
+Perquè els missatges nuls facin avançar el temps als cicles de la fàbrica
+(3 -> 5 -> 3, 3 -> 4 -> 3) cal una anticipació (lookahead) positiva. Els
+serveis Erlang poden ser tan curts com es vulgui, per això cada estació
+genera per avançat els seus serveis: el j-èsim encàrrec que comença a
+l'estació dura la mitjana del seu producte per la j-èsima Erlang de mitjana
+1 del flux de l'estació. Amb cues FIFO i c màquines, cap encàrrec que
+encara no ha arribat pot sortir abans de
+
+    max(rellotge d'entrada, primera màquina lliure) + m * min(G_j, ..., G_j+c-1)
+
+on m és la mitjana més curta dels productes que hi passen. El model és el
+mateix que `models.fabrica`, però els temps de servei s'assignen per estació
+i no per encàrrec, i per tant els resultats no coincideixen rèplica a
+rèplica amb els altres motors, només en distribució.
+
+Els processos lògics es reparteixen entre `processos` processos del sistema
+i els missatges entre processos s'envien agrupats a cada ronda. El resultat
+no depèn del nombre de processos.
+"""
+from bisect import bisect_right
+from collections import deque
+from heapq import heappop, heappush
+from itertools import accumulate
+import multiprocessing as mp
+import queue
+
+from .models import ANY, FABRICA, kpis_fabrica
+from .variates import Streams
+
+# Identificador del procés lògic de les arribades (les estacions són 1..n)
+FONT = 0
+
+
+class _Source:
+    """
+    Arribades d'encàrrecs: no té entrades i les envia per finestres de durada `interval`
+
+    Cada finestra porta el missatge nul del seu final, com les estacions,
+    de manera que la memòria no creix amb l'horitzó.
+    """
+
+    def __init__(self, fabrica, streams, temps, interval):
+        self.id = FONT
+        self.fabrica = fabrica
+        self.temps = temps
+        self.interval = interval
+        self.arribades = streams["arribades"]
+        self.productes = streams["productes"]
+        self.noms = list(fabrica["productes"])
+        self.probs = list(accumulate(fabrica["productes"][n]["p"] for n in self.noms))
+        self.outputs = sorted({p["ruta"][0] for p in fabrica["productes"].values()})
+        self.next = self.arribades.exponential(fabrica["arribades"])
+        self.clock = 0.0
+        self.done = False
+
+    def receive(self, src, msgs, clock):
+        pass
+
+    def advance(self):
+        if self.done:
+            return {}
+        fabrica = self.fabrica
+        end = min(self.clock + self.interval, self.temps)
+        out = {}
+        while self.next < end:
+            nom = self.noms[min(bisect_right(self.probs, self.productes.random()),
+                                len(self.noms) - 1)]
+            # Encàrrec: [producte, pas del circuit, espera acumulada]
+            first = fabrica["productes"][nom]["ruta"][0]
+            out.setdefault(first, []).append((self.next, [nom, 0, 0.0]))
+            self.next += self.arribades.exponential(fabrica["arribades"])
+        self.clock = end
+        if end >= self.temps:
+            # Els canals queden tancats
+            self.done = True
+            end = float("inf")
+        return {d: (out.get(d, []), end) for d in self.outputs}
+
+
+class _Station:
+    """
+    Estació com a procés lògic: cua FIFO amb c màquines (recurrència de Kiefer-Wolfowitz)
+    """
+
+    def __init__(self, s, fabrica, streams, temps, inputs):
+        self.id = s
+        self.temps = temps
+        self.k = fabrica["k"]
+        self.c = fabrica["estacions"][s - 1]
+        self.productes = fabrica["productes"]
+        self.g = streams["estacio_{}".format(s)]
+        self.unit = deque(self.g.erlang(self.k, 1.0) for _ in range(self.c))
+        # Mitjana més curta dels productes que passen per l'estació
+        self.m = min(t for p in self.productes.values()
+                     for r, t in zip(p["ruta"], p["temps"]) if r == s)
+        self.free = [0.0] * self.c
+        self.clocks = {src: 0.0 for src in inputs}
+        self.inbox = []
+        self.pending = []
+        self._seq = 0
+        self.out_clock = 0.0
+        self.done = False
+        # Acumuladors
+        self.area_cua = 0.0
+        self.area_ocupades = 0.0
+        self.espera_est = 0.0
+        self.n_est = 0
+        self.servei = {}
+        self.espera = {}
+
+    def receive(self, src, msgs, clock):
+        for t, job in msgs:
+            heappush(self.inbox, (t, src, self._seq, job))
+            self._seq += 1
+        if clock is not None:
+            self.clocks[src] = clock
+
+    def _arrival(self, a, job):
+        temps = self.temps
+        nom, pas, espera = job
+        start = max(a, heappop(self.free))
+        g = self.unit.popleft()
+        self.unit.append(self.g.erlang(self.k, 1.0))
+        servei = self.productes[nom]["temps"][pas] * g
+        dep = start + servei
+        heappush(self.free, dep)
+        if start < temps:
+            self.espera_est += start - a
+            self.n_est += 1
+            self.area_ocupades += min(dep, temps) - start
+        self.area_cua += min(start, temps) - a
+        if dep >= temps:
+            return
+        acc = self.servei.setdefault(nom, [0.0, 0])
+        acc[0] += servei
+        acc[1] += 1
+        job = [nom, pas + 1, espera + start - a]
+        ruta = self.productes[nom]["ruta"]
+        if pas + 1 == len(ruta):
+            acc = self.espera.setdefault(nom, [0.0, 0])
+            acc[0] += job[2]
+            acc[1] += 1
+        else:
+            heappush(self.pending, (dep, self._seq, ruta[pas + 1], job))
+            self._seq += 1
+
+    def advance(self):
+        """
+        Processa les arribades segures i retorna els missatges per destinació
+        """
+        if self.done:
+            return {}
+        clock = min(self.clocks.values()) if self.clocks else float("inf")
+        # Arribades segures, en ordre de temps (i de canal si coincideixen)
+        inbox = self.inbox
+        while inbox and inbox[0][0] < clock:
+            a, _, _, job = heappop(inbox)
+            if a < self.temps:
+                self._arrival(a, job)
+        if clock >= self.temps:
+            # Totes les arribades abans de l'horitzó ja s'han processat
+            bound = float("inf")
+            self.done = True
+        else:
+            bound = (max(clock, self.free[0])
+                     + self.m * min(self.unit[i] for i in range(self.c)))
+        bound = max(bound, self.out_clock)
+        out = {}
+        while self.pending and self.pending[0][0] <= bound:
+            t, _, dst, job = heappop(self.pending)
+            out.setdefault(dst, []).append((t, job))
+        if bound > self.out_clock or out:
+            self.out_clock = bound
+            return {dst: (out.get(dst, []), bound) for dst in self.outputs}
+        return {}
+
+    def stats(self):
+        return {"area_cua": self.area_cua, "area_ocupades": self.area_ocupades,
+                "espera_est": self.espera_est, "n_est": self.n_est,
+                "servei": self.servei, "espera": self.espera}
+
+
+def _channels(fabrica):
+    """
+    Canals (origen, destinació) entre processos lògics
+    """
+    links = set()
+    for p in fabrica["productes"].values():
+        ruta = p["ruta"]
+        links.add((FONT, ruta[0]))
+        links.update(zip(ruta, ruta[1:]))
+    return links
+
+
+def _groups(fabrica, processos):
+    """
+    Reparteix les estacions en `processos` grups segons el trànsit d'encàrrecs
+
+    Es comença amb una estació per grup i s'ajunten els dos grups que
+    s'intercanvien més encàrrecs (per unitat de temps), sense passar de
+    ceil(n / processos) estacions per grup. Per a la fàbrica per defecte i
+    dos processos dona [[1, 2], [3, 4, 5]].
+    """
+    n = len(fabrica["estacions"])
+    processos = min(processos, n)
+    limit = -(-n // processos)
+    traffic = {}
+    for p in fabrica["productes"].values():
+        for a, b in zip(p["ruta"], p["ruta"][1:]):
+            key = (min(a, b), max(a, b))
+            traffic[key] = traffic.get(key, 0.0) + p["p"]
+    groups = [[s] for s in range(1, n + 1)]
+    while len(groups) > processos:
+        best = None
+        for i in range(len(groups)):
+            for j in range(i + 1, len(groups)):
+                if len(groups[i]) + len(groups[j]) > limit:
+                    continue
+                w = sum(traffic.get((min(a, b), max(a, b)), 0.0)
+                        for a in groups[i] for b in groups[j])
+                # Amb el mateix trànsit, s'ajunten els grups més petits
+                score = (w, -len(groups[i]) - len(groups[j]))
+                if best is None or score > best[0]:
+                    best = (score, i, j)
+        _, i, j = best
+        groups[i] = sorted(groups[i] + groups.pop(j))
+    return sorted(groups)
+
+
+def _build(fabrica, rng, temps, antitetic, interval):
+    streams = Streams(rng, antithetic=antitetic)
+    links = _channels(fabrica)
+    lps = {FONT: _Source(fabrica, streams, temps, interval)}
+    for s in range(1, len(fabrica["estacions"]) + 1):
+        lp = _Station(s, fabrica, streams, temps, [a for a, b in links if b == s])
+        lp.outputs = sorted(b for a, b in links if a == s)
+        lps[s] = lp
+    return lps
+
+
+def _run_group(lps, owner, inbox, outboxes):
+    """
+    Bucle d'un grup de processos lògics
+
+    Els missatges entre processos lògics del grup es lliuren directament.
+    Els altres s'acumulen per procés de destinació i s'envien quan el grup
+    ja no pot avançar més pel seu compte (o quan se n'han acumulat molts),
+    i llavors s'espera el següent paquet de missatges.
+    """
+    remote = {}
+    pending = 0
+    while not all(lp.done for lp in lps.values()):
+        progress = False
+        # Missatges rebuts d'altres processos
+        while inbox is not None:
+            try:
+                batch = inbox.get_nowait()
+            except queue.Empty:
+                break
+            for src, dst, msgs, clock in batch:
+                lps[dst].receive(src, msgs, clock)
+        for lp in lps.values():
+            out = lp.advance()
+            for dst, (msgs, clock) in out.items():
+                progress = True
+                if dst in lps:
+                    lps[dst].receive(lp.id, msgs, clock)
+                else:
+                    remote.setdefault(owner[dst], []).append((lp.id, dst, msgs, clock))
+                    pending += 1
+        if not progress and inbox is None:
+            raise RuntimeError("els processos lògics s'han bloquejat")
+        if remote and (not progress or pending >= 1000
+                       or all(lp.done for lp in lps.values())):
+            for w, batch in remote.items():
+                outboxes[w].put(batch)
+            remote = {}
+            pending = 0
+        if not progress:
+            for src, dst, msgs, clock in inbox.get():
+                lps[dst].receive(src, msgs, clock)
+
+
+def _worker(lps, owner, inbox, outboxes, results):
+    _run_group(lps, owner, inbox, outboxes)
+    results.put({i: lp.stats() for i, lp in lps.items() if i != FONT})
+
+
+def _report(fabrica, stats, temps):
+    n = len(fabrica["estacions"])
+    espera, servei = {}, {}
+    for nom, p in fabrica["productes"].items():
+        x = [stats[s]["espera"].get(nom, [0.0, 0]) for s in range(1, n + 1)]
+        total, count = sum(a for a, _ in x), sum(b for _, b in x)
+        espera[nom] = (total / count if count else 0.0, count)
+        for s in p["ruta"]:
+            acc = stats[s]["servei"].get(nom, [0.0, 0])
+            servei[nom, s] = acc[0] / acc[1] if acc[1] else 0.0
+    st = [stats[s] for s in range(1, n + 1)]
+    return kpis_fabrica(
+        fabrica, espera, servei,
+        [x["area_cua"] / temps for x in st],
+        [x["area_ocupades"] / (c * temps) for x, c in zip(st, fabrica["estacions"])],
+        [x["espera_est"] / x["n_est"] if x["n_est"] else 0.0 for x in st])
+
+
+def fabrica(rng, temps=ANY, fabrica=FABRICA, processos=1, interval=7.5, antitetic=None):
+    """
+    Fàbrica de la Pràctica 9 amb un procés lògic per estació
+
+    Amb `processos` > 1 les estacions es reparteixen entre aquest nombre de
+    processos del sistema (la font va amb el primer grup), de manera que les
+    estacions que s'intercanvien més encàrrecs vagin juntes (`_groups`).
+    També es poden donar els grups d'estacions, per exemple
+    `[[1, 2], [3, 4, 5]]`.
+    La font envia les arribades per finestres de `interval` hores (una
+    jornada per defecte). Retorna els indicadors de `models.fabrica`.
+    """
+    lps = _build(fabrica, rng, temps, antitetic, interval)
+    if not isinstance(processos, int):
+        groups = [list(g) for g in processos]
+    elif processos > 1:
+        groups = _groups(fabrica, processos)
+    else:
+        groups = [[i for i in lps if i != FONT]]
+    if len(groups) == 1:
+        _run_group(lps, {i: 0 for i in lps}, None, None)
+        return _report(fabrica, {i: lp.stats() for i, lp in lps.items() if i != FONT}, temps)
+
+    processos = len(groups)
+    owner = {FONT: 0}
+    for j, g in enumerate(groups):
+        for s in g:
+            owner[s] = j
+    ctx = mp.get_context()
+    inboxes = [ctx.Queue() for _ in range(processos)]
+    results = ctx.Queue()
+    workers = []
+    for w in range(processos):
+        group = {i: lp for i, lp in lps.items() if owner[i] == w}
+        p = ctx.Process(target=_worker, args=(group, owner, inboxes[w], inboxes, results))
+        p.start()
+        workers.append(p)
+    stats = {}
+    for _ in workers:
+        stats.update(results.get())
+    for p in workers:
+        p.join()
+    return _report(fabrica, stats, temps)
@@ -0,0 +1,214 @@
+"""
+Cadenes de Markov de temps continu amb generador dispers.
+
+Quan tots els temps d'un model són exponencials, l'estat del sistema és
+una cadena de Markov de temps continu i els indicadors es poden calcular
+sense simular:
+
+- `generator` construeix la matriu generadora Q explorant els estats
+  accessibles des d'un estat inicial amb una funció que dona les
+  transicions de cada estat i les seves taxes;
+- `steady_state` resol pi Q = 0 amb la condició de suma 1 (sistema lineal
+  dispers);
+- `transient` dona la distribució a l'instant t amb `expm_multiply` o per
+  uniformització, i `cumulative` la integral de la distribució entre 0 i
+  t, que dona les mitjanes temporals d'una simulació de durada t.
+
+`taller` aplica tot això al taller de la Pràctica 8 i retorna els mateixos
+indicadors que `models.taller`, en mil·lisegons en lloc de segons.
+"""
+from collections import deque
+
+import numpy as np
+from scipy import sparse, stats
+from scipy.sparse.linalg import expm_multiply, spsolve
+
+
+def generator(initial, transitions):
+    """
+    Matriu generadora (CSR) dels estats accessibles des de `initial`
+
+    `transitions(estat)` ha de donar parelles `(taxa, estat_nou)`; els estats
+    han de ser hashables (per exemple tuples). Retorna la matriu i la llista
+    d'estats, en l'ordre de les files.
+    """
+    index = {initial: 0}
+    states = [initial]
+    rows, cols, rates = [], [], []
+    todo = deque([initial])
+    while todo:
+        s = todo.popleft()
+        i = index[s]
+        for rate, t in transitions(s):
+            if rate <= 0 or t == s:
+                continue
+            j = index.get(t)
+            if j is None:
+                j = index[t] = len(states)
+                states.append(t)
+                todo.append(t)
+            rows.append(i)
+            cols.append(j)
+            rates.append(rate)
+    n = len(states)
+    Q = sparse.csr_matrix((rates, (rows, cols)), shape=(n, n))
+    Q.sum_duplicates()
+    Q = Q - sparse.diags(np.asarray(Q.sum(axis=1)).ravel())
+    return Q.tocsr(), states
+
+
+def steady_state(Q):
+    """
+    Distribució estacionària pi Q = 0, amb suma 1, amb un sistema lineal dispers
+
+    Es fixa pi[0] = 1, es resolen les altres equacions i es normalitza al
+    final: una fila de normalització (tota plena d'uns) faria que la
+    factorització LU s'omplís.
+    """
+    QT = Q.T.tocsc()
+    pi = np.ones(Q.shape[0])
+    pi[1:] = spsolve(QT[1:, 1:], -QT[1:, 0].toarray().ravel())
+    pi = np.maximum(pi, 0)
+    return pi / pi.sum()
+
+
+def _initial(p0, n):
+    if np.isscalar(p0):
+        x = np.zeros(n)
+        x[int(p0)] = 1.0
+        return x
+    return np.asarray(p0, dtype=float)
+
+
+def _uniformization(Q, p0, t, tol=1e-10):
+    """
+    Distribució a l'instant `t` i la seva integral entre 0 i `t`
+
+    Amb Lambda >= max |q_ii| i P = I + Q / Lambda, el nombre de salts fins a
+    t és de Poisson(Lambda t), i
+
+        p(t) = sum_k Pois(k) p0 P^k,  int_0^t p = 1 / Lambda sum_k P(N > k) p0 P^k
+    """
+    n = Q.shape[0]
+    x = _initial(p0, n)
+    lam = -Q.diagonal().min()
+    if lam <= 0 or t == 0:
+        return x, x * t
+    PT = (sparse.identity(n, format="csr") + Q / lam).T.tocsr()
+    mu = lam * t
+    K = int(stats.poisson.ppf(1 - tol, mu)) + 1
+    k = np.arange(K + 1)
+    pmf = stats.poisson.pmf(k, mu)
+    sf = stats.poisson.sf(k, mu)
+    point = np.zeros(n)
+    area = np.zeros(n)
+    for j in range(K + 1):
+        point += pmf[j] * x
+        area += sf[j] * x
+        x = PT @ x
+    return point, area / lam
+
+
+def transient(Q, p0, t, method="uniformitzacio", tol=1e-10):
+    """
+    Distribució a l'instant `t` des de `p0` (un estat o un vector de probabilitats)
+
+    `method` és `uniformitzacio` o `expm` (`scipy.sparse.linalg.expm_multiply`).
+    """
+    if method == "expm":
+        x = _initial(p0, Q.shape[0])
+        return expm_multiply(Q.T * t, x)
+    if method != "uniformitzacio":
+        raise ValueError("mètode desconegut: {}".format(method))
+    return _uniformization(Q, p0, t, tol)[0]
+
+
+def cumulative(Q, p0, t, tol=1e-10):
+    """
+    Temps esperat passat a cada estat entre 0 i `t` (per uniformització)
+
+    Dividit per `t`, són les proporcions de temps que mesura una simulació
+    de durada `t` que comença a `p0`.
+    """
+    return _uniformization(Q, p0, t, tol)[1]
+
+
+def _taller(n_maquines, n_operaris, arribades, proces, preparacio, reparacio,
+            p_reparacio, cua_max):
+    """
+    Transicions del taller: estat (cua, preparant, processant, avariades, reparant)
+    """
+    M, O = n_maquines, n_operaris
+
+    def dispatch(q, p, r, w, f):
+        # Prioritat estricta de les reparacions, com `ResourceSet(order="priority")`:
+        # mentre n'hi ha una en espera, les preparacions no passen
+        while True:
+            lliures_m = M - p - r - w - f
+            lliures_o = O - p - 2 * f
+            if w > 0:
+                if lliures_o < 2:
+                    return q, p, r, w, f
+                w, f = w - 1, f + 1
+            elif q > 0 and lliures_m >= 1 and lliures_o >= 1:
+                q, p = q - 1, p + 1
+            else:
+                return q, p, r, w, f
+
+    def transitions(s):
+        q, p, r, w, f = s
+        if q < cua_max:
+            yield 1 / arribades, dispatch(q + 1, p, r, w, f)
+        if p:
+            yield p / preparacio, dispatch(q, p - 1, r + 1, w, f)
+        if r:
+            yield p_reparacio * r / proces, dispatch(q, p, r - 1, w + 1, f)
+            yield (1 - p_reparacio) * r / proces, dispatch(q, p, r - 1, w, f)
+        if f:
+            yield f / reparacio, dispatch(q, p, r, w, f - 1)
+
+    return transitions
+
+
+def taller(n_maquines=5, n_operaris=3, temps=7 * 24 * 60, arribades=12, proces=60,
+           preparacio=20, reparacio=30, p_reparacio=0.2, cua_max=500, **kwargs):
+    """
+    Taller de la Pràctica 8 com a cadena de Markov de temps continu
+
+    Tots els temps del model són exponencials i les reparacions tenen
+    prioritat estricta, com a `models.taller`, de manera que el resultat és
+    exacte llevat del truncament de la cua a `cua_max` tasques
+    (`truncament` és la probabilitat d'estar-hi, que ha de ser negligible).
+
+    Amb `temps` es calculen les mitjanes d'una simulació de durada `temps`
+    que comença amb el taller buit (com `models.taller`); amb `temps=None`,
+    les del règim estacionari, i llavors `tasques` i `reparacions` són per
+    unitat de temps. L'espera es dedueix de la cua amb la llei de Little;
+    amb el taller saturat i un horitzó finit és només aproximada, perquè la
+    simulació no compta les tasques que encara esperen al final.
+    """
+    Q, states = generator((0, 0, 0, 0, 0), _taller(
+        n_maquines, n_operaris, arribades, proces, preparacio, reparacio, p_reparacio,
+        cua_max))
+    q, p, r, w, f = np.array(states).T
+    if temps is None:
+        occ = steady_state(Q)
+        durada = 1.0
+    else:
+        occ = cumulative(Q, 0, temps) / temps
+        durada = temps
+    cua = occ @ q
+    acceptades = occ @ (q < cua_max) / arribades * durada
+    reparacions = occ @ f / reparacio * durada
+    truncament = occ @ (q == cua_max)
+    return {
+        "cua": float(cua),
+        "espera": float(cua * durada / acceptades) if acceptades > 0 else 0.0,
+        "ocupacio_maquines": float(occ @ (p + r + w + f) / n_maquines),
+        "ocupacio_operaris": float(occ @ (p + 2 * f) / n_operaris),
+        "tasques": float(occ @ r * (1 - p_reparacio) / proces * durada + reparacions),
+        "reparacions": float(reparacions),
+        "truncament": float(truncament),
+        "estats": len(states),
+        "exacte": bool(truncament < 1e-6),
+    }
@@ -0,0 +1,383 @@
+"""
+Camps de direccions i corbes solució d'equacions diferencials y' = g(x, y).
+
+El notebook `Equacions_diferencials` repeteix per a cada equació la
+graella, el pendent, la normalització i `plt.streamplot`. Aquí l'equació
+es dona com una expressió de sympy (o un text), es compila una sola vegada
+amb `lambdify` i s'avalua de cop sobre graelles de qualsevol resolució:
+
+    edo.plot("y - x**2", xlim=(-5, 5), ylim=(-5, 5))
+
+Les corbes solució s'integren amb Runge-Kutta 4 per a totes les llavors
+alhora, parametritzades per la longitud d'arc en coordenades de la
+finestra: el vector director (1, g) es normalitza, de manera que els
+pendents molt grans o infinits no fan explotar el pas d'integració. Les
+corbes s'aturen quan surten de la finestra o quan g no és finita.
+
+Per a les equacions autònomes y' = g(y), `equilibria` fa numèricament la
+recepta del notebook (zeros de g, estabilitat, punts d'inflexió) per a
+milers de valors d'un paràmetre alhora, i `plot_equilibria` en dibuixa el
+diagrama de bifurcació:
+
+    res = edo.equilibria("r*y*(1 - y)", {"r": np.linspace(-2, 2, 2001)})
+"""
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+import numpy as np
+import sympy as sp
+
+
+def slope(expr, x="x", y="y"):
+    """
+    Funció de NumPy g(x, y) a partir d'una expressió de sympy o d'un text
+
+    El resultat té sempre la forma de `x` i `y` (també si g és constant o
+    no depèn d'una de les variables). Si `expr` ja és una funció, es
+    retorna tal qual.
+    """
+    if callable(expr) and not isinstance(expr, sp.Basic):
+        return expr
+    expr = sp.sympify(expr)
+    x, y = sp.Symbol(x) if isinstance(x, str) else x, sp.Symbol(y) if isinstance(y, str) else y
+    f = sp.lambdify((x, y), expr, "numpy")
+
+    def g(xv, yv):
+        xv, yv = np.broadcast_arrays(np.asarray(xv, dtype=float), np.asarray(yv, dtype=float))
+        with np.errstate(all="ignore"):
+            return np.broadcast_to(np.asarray(f(xv, yv), dtype=float), xv.shape)
+    g.expr = expr
+    return g
+
+
+def _direction(s):
+    """
+    Vector director unitari (1, s) / |(1, s)|, també per a pendents infinits
+    """
+    h = np.hypot(1.0, s)
+    with np.errstate(invalid="ignore"):
+        u = 1.0 / h
+        v = np.where(np.isinf(s), np.sign(s), s / h)
+    return u, v
+
+
+def field(g, xlim=(-5, 5), ylim=(-5, 5), n=500):
+    """
+    Graella (n x n) i vectors directors unitaris del camp de direccions
+
+    Retorna `X, Y, U, V`, com el bloc meshgrid / pendent / normalització del
+    notebook. `n` pot ser un enter o una parella (columnes, files).
+    """
+    g = slope(g)
+    nx, ny = (n, n) if np.isscalar(n) else n
+    X, Y = np.meshgrid(np.linspace(*xlim, nx), np.linspace(*ylim, ny))
+    U, V = _direction(g(X, Y))
+    return X, Y, U, V
+
+
+def streamlines(g, seeds, xlim=(-5, 5), ylim=(-5, 5), step=0.005, length=2.0):
+    """
+    Corbes solució que passen per les llavors, integrades amb RK4 en paral·lel
+
+    `seeds` és una matriu (llavors x 2) de punts (x, y). Cada corba
+    s'integra cap endavant i cap enrere una longitud d'arc `length` amb
+    passos `step`, mesurats en fraccions de la mida de la finestra. Retorna
+    una matriu (punts x llavors x 2) amb NaN als punts de fora de la
+    finestra, de la qual `segments` treu els trams per a `LineCollection`.
+    """
+    g = slope(g)
+    seeds = np.atleast_2d(np.asarray(seeds, dtype=float))
+    (x0, x1), (y0, y1) = xlim, ylim
+    lx, ly = x1 - x0, y1 - y0
+
+    def rhs(p):
+        # Pendent en coordenades de la finestra, on tots dos eixos fan 1
+        s = g(x0 + lx * p[:, 0], y0 + ly * p[:, 1]) * (lx / ly)
+        return np.stack(_direction(s), axis=1)
+
+    steps = int(np.ceil(length / step))
+    p0 = np.column_stack([(seeds[:, 0] - x0) / lx, (seeds[:, 1] - y0) / ly])
+    halves = []
+    for h in (step, -step):
+        out = np.full((steps + 1, len(seeds), 2), np.nan)
+        p = p0.copy()
+        out[0] = p
+        alive = np.all((p >= 0) & (p <= 1), axis=1)
+        for i in range(1, steps + 1):
+            if not alive.any():
+                break
+            q = p[alive]
+            k1 = rhs(q)
+            k2 = rhs(q + 0.5 * h * k1)
+            k3 = rhs(q + 0.5 * h * k2)
+            k4 = rhs(q + h * k3)
+            q = q + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+            ok = np.all(np.isfinite(q), axis=1) & np.all((q >= 0) & (q <= 1), axis=1)
+            idx = np.flatnonzero(alive)
+            p[idx[ok]] = q[ok]
+            out[i, idx[ok]] = q[ok]
+            alive[idx[~ok]] = False
+        halves.append(out)
+    # Tram enrere (invertit) seguit del tram endavant
+    pts = np.concatenate([halves[1][:0:-1], halves[0]])
+    pts[..., 0] = x0 + lx * pts[..., 0]
+    pts[..., 1] = y0 + ly * pts[..., 1]
+    return pts
+
+
+def thin(pts, xlim, ylim, cells=30):
+    """
+    Retalla les corbes perquè no passin per cel·les que ja ocupa una altra corba
+
+    És el criteri de `plt.streamplot`: la finestra es divideix en
+    `cells` x `cells` cel·les i cada corba, des de la seva llavor cap
+    endavant i cap enrere, s'atura a la primera cel·la ocupada. Les corbes
+    que comencen en una cel·la ocupada es descarten. Retorna una còpia de
+    `pts` amb NaN als punts retallats.
+    """
+    pts = pts.copy()
+    (x0, x1), (y0, y1) = xlim, ylim
+    nx, ny = (cells, cells) if np.isscalar(cells) else cells
+    with np.errstate(invalid="ignore"):
+        ci = np.clip(((pts[..., 0] - x0) / (x1 - x0) * nx).astype(np.int64), 0, nx - 1)
+        cj = np.clip(((pts[..., 1] - y0) / (y1 - y0) * ny).astype(np.int64), 0, ny - 1)
+    cell = np.where(np.isfinite(pts).all(axis=-1), cj * nx + ci, -1)
+    occupied = np.zeros(nx * ny, dtype=bool)
+    mid = pts.shape[0] // 2
+    for j in range(pts.shape[1]):
+        c = cell[:, j]
+        if c[mid] < 0 or occupied[c[mid]]:
+            pts[:, j] = np.nan
+            continue
+        keep = np.zeros(len(c), dtype=bool)
+        for part in (slice(mid, None), slice(mid, None, -1)):
+            cp = c[part]
+            # La corba pot tornar a la mateixa cel·la, però no entrar a una d'ocupada
+            stop = np.flatnonzero((cp < 0) | occupied[np.maximum(cp, 0)])
+            end = stop[0] if len(stop) else len(cp)
+            keep[part][:end] = True
+        pts[~keep, j] = np.nan
+        occupied[c[keep]] = True
+    return pts
+
+
+def segments(pts):
+    """
+    Trams sense NaN de cada corba de `streamlines`, per a `LineCollection`
+    """
+    out = []
+    for j in range(pts.shape[1]):
+        line = pts[:, j]
+        ok = np.isfinite(line).all(axis=1)
+        # Els NaN parteixen la corba en trams
+        edges = np.flatnonzero(np.diff(np.r_[0, ok.astype(np.int8), 0]))
+        for a, b in zip(edges[::2], edges[1::2]):
+            if b - a > 1:
+                out.append(line[a:b])
+    return out
+
+
+def plot(g, xlim=(-5, 5), ylim=(-5, 5), density=1, resolution=500, arrows=20,
+         regions=True, ax=None, title=None, **kwargs):
+    """
+    Dibuixa el camp de direccions i les corbes solució de y' = g(x, y)
+
+    - `density`: les corbes surten d'una graella de (10 density)^2 llavors i
+      es retallen, com a `plt.streamplot`, en una graella de 30 density
+      cel·les per eix;
+    - `arrows`: petits segments amb el pendent en una graella arrows x arrows
+      (0 per no dibuixar-los);
+    - `regions`: ombreja les regions on y' > 0 i y' < 0, avaluades en una
+      graella `resolution` x `resolution`.
+
+    Els altres arguments van a la `LineCollection` de les corbes. Retorna
+    els eixos.
+    """
+    f = slope(g)
+    if ax is None:
+        ax = plt.gca()
+    if regions:
+        X, Y = np.meshgrid(np.linspace(*xlim, resolution), np.linspace(*ylim, resolution))
+        ax.imshow(np.sign(f(X, Y)), origin="lower", extent=(*xlim, *ylim), aspect="auto",
+                  cmap="RdBu", vmin=-4, vmax=4, interpolation="nearest")
+    if arrows:
+        X, Y = np.meshgrid(np.linspace(*xlim, arrows), np.linspace(*ylim, arrows))
+        # Segments centrats de mida una fracció de la cel·la
+        sx = 0.35 * (xlim[1] - xlim[0]) / arrows
+        sy = 0.35 * (ylim[1] - ylim[0]) / arrows
+        u, v = _direction(f(X, Y) * sx / sy)
+        a = np.stack([X - u * sx, Y - v * sy], axis=-1).reshape(-1, 2)
+        b = np.stack([X + u * sx, Y + v * sy], axis=-1).reshape(-1, 2)
+        ok = np.isfinite(a).all(axis=1) & np.isfinite(b).all(axis=1)
+        ax.add_collection(LineCollection(np.stack([a, b], axis=1)[ok], colors="0.4",
+                                         linewidths=0.8))
+    m = max(1, int(round(10 * density)))
+    sx, sy = np.meshgrid(np.linspace(*xlim, m + 2)[1:-1], np.linspace(*ylim, m + 2)[1:-1])
+    pts = streamlines(f, np.column_stack([sx.ravel(), sy.ravel()]), xlim, ylim)
+    pts = thin(pts, xlim, ylim, max(1, int(round(30 * density))))
+    kwargs.setdefault("colors", "C0")
+    kwargs.setdefault("linewidths", 1.0)
+    ax.add_collection(LineCollection(segments(pts), **kwargs))
+    ax.set_xlim(*xlim)
+    ax.set_ylim(*ylim)
+    if title is None and hasattr(f, "expr"):
+        title = "y' = {}".format(f.expr)
+    if title:
+        ax.set_title(title)
+    return ax
+
+
+def _compiled(f):
+    """
+    Funció de `lambdify` que sempre retorna la forma dels arguments combinats
+    """
+    def h(*args):
+        with np.errstate(all="ignore"):
+            return np.broadcast_to(np.asarray(f(*args), dtype=float), np.broadcast(*args).shape)
+    return h
+
+
+def _brackets(f, yv, args):
+    """
+    Zeros de f(y, *args) a cada fila: canvis de signe a la graella `yv` i bisecció
+
+    Retorna la fila, el zero, el signe de f a l'esquerra i a la dreta.
+    """
+    F = f(yv[None, :], *(a[:, None] for a in args))
+    S = np.sign(F)
+    finite = np.isfinite(F)
+    # Canvis de signe entre punts consecutius de la graella
+    rows, cols = np.nonzero((S[:, :-1] * S[:, 1:] < 0) & finite[:, :-1] & finite[:, 1:])
+    lo, hi = yv[cols], yv[cols + 1]
+    flo = F[rows, cols]
+    a_r = [a[rows] for a in args]
+    for _ in range(60):
+        mid = 0.5 * (lo + hi)
+        fm = f(mid, *a_r)
+        left = np.sign(fm) == np.sign(flo)
+        lo = np.where(left, mid, lo)
+        flo = np.where(left, fm, flo)
+        hi = np.where(left, hi, mid)
+    root = 0.5 * (lo + hi)
+    froot = np.abs(f(root, *a_r))
+    # Un canvi de signe a través d'un pol no és un zero
+    ok = froot <= np.minimum(np.abs(F[rows, cols]), np.abs(F[rows, cols + 1]))
+    out = [(rows[ok], root[ok], S[rows, cols][ok], S[rows, cols + 1][ok])]
+    # Zeros exactes en un punt de la graella, aïllats (els veïns no són zero)
+    zero = S == 0
+    inner = zero[:, 1:-1] & ~zero[:, :-2] & ~zero[:, 2:]
+    rows, cols = np.nonzero(inner)
+    cols = cols + 1
+    out.append((rows, yv[cols], S[rows, cols - 1], S[rows, cols + 1]))
+    return [np.concatenate(x) for x in zip(*out)]
+
+
+def _pad(rows, values, m):
+    """
+    Valors de cada fila en una matriu (files x màxim de valors) amb NaN de farciment
+
+    Dins de cada fila els valors queden ordenats; retorna també l'ordre aplicat.
+    """
+    order = np.lexsort((values, rows))
+    rows, values = rows[order], values[order]
+    counts = np.bincount(rows, minlength=m)
+    out = np.full((m, counts.max() if len(rows) else 0), np.nan)
+    out[rows, np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)] = values
+    return out, order
+
+
+def equilibria(g, params=None, ylim=(-10, 10), n=2000, y="y", tol=1e-10):
+    """
+    Punts d'equilibri, estabilitat i punts d'inflexió de y' = g(y) per a molts paràmetres
+
+    `params` és un diccionari nom -> valors; els valors es combinen amb
+    `np.broadcast_arrays` i es calculen tots alhora. Es compilen g i g'
+    amb `lambdify`, es busquen els canvis de signe en una graella de `n`
+    punts de `ylim` i es refinen amb bisecció vectoritzada.
+
+    Un equilibri és estable si g passa de positiva a negativa (g' < 0),
+    inestable si passa de negativa a positiva, i semiestable si g toca zero
+    sense canviar de signe. Els zeros dobles no fan canviar de signe g i es
+    busquen entre els zeros de g': els que tenen |g| menor que `tol` vegades
+    el màxim de |g| a la graella són equilibris, etiquetats amb el signe de
+    g a cada costat (per exemple y**2 - h a h = 0, el punt de plec). Si g és
+    zero a tot un interval (per exemple r y (1 - y) amb r = 0) no s'hi dona
+    cap equilibri. Els punts d'inflexió són els zeros de y'' = g'(y) g(y)
+    que no són equilibris, és a dir, els altres zeros de g'.
+
+    Retorna un diccionari amb una fila per valor dels paràmetres:
+    `equilibris` i `derivada` (g' a l'equilibri) amb NaN on no n'hi ha,
+    `estabilitat` amb les etiquetes (text buit on no n'hi ha), `inflexio`
+    amb NaN de farciment, i els valors dels paràmetres.
+    """
+    params = params or {}
+    names = list(params)
+    args = [np.ravel(v) for v in np.broadcast_arrays(*[np.asarray(v, dtype=float)
+                                                       for v in params.values()])]
+    m = len(args[0]) if args else 1
+    expr = sp.sympify(g)
+    ys = sp.Symbol(y)
+    syms = [ys] + [sp.Symbol(name) for name in names]
+    g0 = _compiled(sp.lambdify(syms, expr, "numpy"))
+    g1 = _compiled(sp.lambdify(syms, sp.diff(expr, ys), "numpy"))
+    yv = np.linspace(*ylim, n)
+
+    rows, root, left, right = _brackets(g0, yv, args)
+    # Zeros de g' on g també és (numèricament) zero: zeros dobles de g
+    F = np.abs(g0(yv[None, :], *(a[:, None] for a in args)))
+    scale = np.max(np.where(np.isfinite(F), F, 0), axis=1)
+    r1, z1, _, _ = _brackets(g1, yv, args)
+    a1 = [a[r1] for a in args]
+    double = np.abs(g0(z1, *a1)) <= tol * scale[r1]
+    # Els que ja s'han trobat amb un canvi de signe de g (zeros triples) no es repeteixen
+    dy = yv[1] - yv[0]
+    found, _ = _pad(rows, root, m)
+    if found.shape[1]:
+        double &= ~np.any(np.abs(found[r1] - z1[:, None]) <= 2 * dy, axis=1)
+    r2, z2 = r1[double], z1[double]
+    a2 = [a[r2] for a in args]
+    rows = np.concatenate([rows, r2])
+    root = np.concatenate([root, z2])
+    left = np.concatenate([left, np.sign(g0(z2 - dy, *a2))])
+    right = np.concatenate([right, np.sign(g0(z2 + dy, *a2))])
+    equilibris, order = _pad(rows, root, m)
+    labels = np.where((left > 0) & (right < 0), "estable",
+                      np.where((left < 0) & (right > 0), "inestable", "semiestable"))
+    filled = ~np.isnan(equilibris)
+    estabilitat = np.full(equilibris.shape, "", dtype="<U11")
+    # `_pad` ordena per fila i valor, el mateix ordre que les posicions plenes
+    estabilitat[filled] = labels[order]
+    r = np.nonzero(filled)[0]
+    derivada = np.full(equilibris.shape, np.nan)
+    derivada[filled] = g1(equilibris[filled], *[a[r] for a in args])
+
+    # Els zeros de g' que també són zeros de g no són punts d'inflexió
+    keep = np.abs(g0(z1, *a1)) > tol * scale[r1]
+    inflexio, _ = _pad(r1[keep], z1[keep], m)
+
+    out = {"equilibris": equilibris, "estabilitat": estabilitat, "derivada": derivada,
+           "inflexio": inflexio}
+    for name, v in zip(names, args):
+        out[name] = v
+    return out
+
+
+def plot_equilibria(res, param, ax=None, inflection=True):
+    """
+    Diagrama de bifurcació del resultat de `equilibria` respecte del paràmetre `param`
+
+    Els equilibris estables es dibuixen en negre, els inestables en vermell
+    i els semiestables en gris; els punts d'inflexió, en blau.
+    """
+    if ax is None:
+        ax = plt.gca()
+    p = np.broadcast_to(res[param][:, None], res["equilibris"].shape)
+    for label, color in [("estable", "k"), ("inestable", "C3"), ("semiestable", "0.5")]:
+        sel = res["estabilitat"] == label
+        ax.plot(p[sel], res["equilibris"][sel], ".", color=color, markersize=2, label=label)
+    if inflection and res["inflexio"].size:
+        q = np.broadcast_to(res[param][:, None], res["inflexio"].shape)
+        ax.plot(q.ravel(), res["inflexio"].ravel(), ",", color="C0", label="inflexió")
+    ax.set_xlabel(param)
+    ax.set_ylabel("y")
+    ax.legend()
+    return ax
@@ -0,0 +1,141 @@
+"""
+Registre compacte dels temps de cada entitat (client, tasca, encàrrec).
+
+Per estudiar la distribució de l'espera cal conèixer, per a cada client,
+l'instant d'arribada, d'inici del servei i de sortida. Guardar-ho en un
+objecte de Python per client ocupa massa amb milions de clients; un
+`EntityStore` ho guarda en una taula de NumPy indexada per l'identificador
+de l'entitat, que creix per blocs.
+
+Té la interfície d'un `Tracer`, de manera que es pot passar directament als
+models:
+
+    store = EntityStore()
+    models.taquilles(rng, temps=10**5, tracer=store)
+    store.percentiles([50, 90, 99])
+"""
+import numpy as np
+import pandas as pd
+
+# Esdeveniments dels models de referència -> camp que marquen
+EVENTS = {
+    "arribada": "arribada",
+    "venda": "inici",
+    "preparacio": "inici",
+    "seguent": "sortida",
+    "fi": "sortida",
+}
+
+# Temps derivats: nom -> (camp inicial, camp final)
+SPANS = {
+    "espera": ("arribada", "inici"),
+    "servei": ("inici", "sortida"),
+    "estada": ("arribada", "sortida"),
+}
+
+
+class EntityStore:
+    """
+    Taula (entitat x camp) d'instants, amb NaN per als que encara no han passat
+
+    Els camps per defecte són `arribada`, `inici` i `sortida`; `events`
+    diu quin camp marca cada esdeveniment quan es fa servir com a traça.
+    """
+
+    def __init__(self, fields=("arribada", "inici", "sortida"), capacity=1024,
+                 chunk=65536, events=EVENTS):
+        self.fields = list(fields)
+        self._index = {f: i for i, f in enumerate(self.fields)}
+        self.events = {e: self._index[f] for e, f in events.items() if f in self._index}
+        self.chunk = chunk
+        self._v = np.full((max(int(capacity), 1), len(self.fields)), np.nan)
+        self._n = 0
+        # Els models comproven `tracer.debug` abans de cridar-lo
+        self.debug = self.info = self.warning = self.record
+
+    def __len__(self):
+        return self._n
+
+    def _grow(self, n):
+        # Es creix per duplicació, arrodonint a blocs de `chunk` files
+        capacity = max(2 * len(self._v), n)
+        capacity = -(-capacity // self.chunk) * self.chunk
+        v = np.full((capacity, len(self.fields)), np.nan)
+        v[:self._n] = self._v[:self._n]
+        self._v = v
+
+    def set(self, entity, field, t):
+        """
+        Marca l'instant `t` del camp `field` de l'entitat `entity`
+        """
+        if entity >= len(self._v):
+            self._grow(entity + 1)
+        self._v[entity, self._index[field]] = t
+        if entity >= self._n:
+            self._n = entity + 1
+
+    def arrive(self, t):
+        """
+        Dona d'alta una entitat nova que arriba a l'instant `t` i en retorna l'identificador
+        """
+        entity = self._n
+        self.set(entity, self.fields[0], t)
+        return entity
+
+    def record(self, t, event, entity=-1, value=np.nan):
+        """
+        Interfície de traça: marca el camp associat a l'esdeveniment
+        """
+        j = self.events.get(event)
+        if j is not None and entity >= 0:
+            if entity >= len(self._v):
+                self._grow(entity + 1)
+            self._v[entity, j] = t
+            if entity >= self._n:
+                self._n = entity + 1
+
+    def times(self, field):
+        """
+        Instants d'un camp per a totes les entitats (vista, sense còpia)
+        """
+        return self._v[:self._n, self._index[field]]
+
+    def records(self):
+        """
+        Taula com a array estructurat de NumPy (vista, sense còpia)
+        """
+        dtype = np.dtype([(f, "f8") for f in self.fields])
+        return self._v[:self._n].view(dtype).ravel()
+
+    def span(self, kind="espera"):
+        """
+        Durades `espera`, `servei` o `estada` de les entitats que les han completat
+        """
+        start, end = SPANS[kind]
+        d = self.times(end) - self.times(start)
+        return d[~np.isnan(d)]
+
+    def histogram(self, kind="espera", bins=50, range=None, density=False):
+        """
+        Histograma de les durades (comptes i vores dels intervals, com `np.histogram`)
+        """
+        return np.histogram(self.span(kind), bins=bins, range=range, density=density)
+
+    def percentiles(self, q=(50, 90, 95, 99), kinds=("espera", "estada")):
+        """
+        Percentils de les durades, una columna per tipus
+        """
+        q = np.atleast_1d(q)
+        out = {}
+        for kind in kinds:
+            d = self.span(kind)
+            out[kind] = np.percentile(d, q) if len(d) else np.nan
+        return pd.DataFrame(out, index=pd.Index(q, name="percentil"))
+
+    def to_frame(self):
+        """
+        Taula com a DataFrame indexat per entitat
+        """
+        df = pd.DataFrame(self._v[:self._n], columns=self.fields)
+        df.index.name = "entitat"
+        return df
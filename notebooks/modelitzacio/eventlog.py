@@ -0,0 +1,300 @@
+"""
+Registre binari d'esdeveniments per a simulacions llargues.
+
+Un `EventLog` escriu cada esdeveniment com un registre de mida fixa
+(temps, esdeveniment, entitat, recurs, valor) a un fitxer `.npy`. Els
+registres s'acumulen en un buffer de mida limitada i s'afegeixen al fitxer
+per blocs, de manera que la memòria no creix amb la durada de la simulació.
+Té la mateixa interfície que un `Tracer` i es pot passar als models:
+
+    with EventLog("logs/replica-00000.npy") as log:
+        models.taquilles(rng, temps=10**6, tracer=log)
+
+Després el fitxer es llegeix amb `open_log`, que el projecta a memòria
+(`np.load(..., mmap_mode="r")`) sense carregar-lo, i els indicadors es
+calculen amb `waits`, `occupancy` i `counts`. Si el nom acaba en
+`.parquet` i hi ha `pyarrow` instal·lat, s'escriu en format Parquet. En
+tots dos casos els noms dels esdeveniments es desen al costat, en un
+fitxer `.json` amb el mateix nom.
+"""
+import glob
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from numpy.lib import format as npy
+
+from .tracer import _LEVELS, _OFF, DEBUG
+
+RECORD = np.dtype([("t", "f8"), ("esdeveniment", "i2"), ("entitat", "i8"),
+                   ("recurs", "i4"), ("valor", "f8")])
+
+# Capçalera de mida fixa perquè es pugui reescriure quan creix el fitxer
+_HEADER = 256
+
+
+def _header(n):
+    """
+    Capçalera `.npy` (versió 1.0) per a `n` registres, de `_HEADER` bytes
+    """
+    d = "{{'descr': {!r}, 'fortran_order': False, 'shape': ({},), }}".format(
+        npy.dtype_to_descr(RECORD), n)
+    pad = _HEADER - 10 - len(d) - 1
+    return (b"\x93NUMPY\x01\x00" + (_HEADER - 10).to_bytes(2, "little")
+            + d.encode("latin1") + b" " * pad + b"\n")
+
+
+def _names_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+
+class EventLog:
+    """
+    Escriptor de registres d'esdeveniments per blocs de `size` registres
+
+    Després de cada bloc s'actualitzen la capçalera i la llista de noms, de
+    manera que si la simulació s'interromp el fitxer `.npy` es pot llegir
+    fins al darrer bloc escrit (un fitxer Parquet no es pot llegir fins que
+    no es tanca).
+    """
+
+    def __init__(self, path, size=65536, level=DEBUG):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.size = size
+        self.names = []
+        self._codes = {}
+        self._buf = []
+        self.n = 0
+        self.parquet = path.endswith(".parquet")
+        if self.parquet:
+            try:
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("cal pyarrow per escriure fitxers Parquet") from None
+            self._file = pq.ParquetWriter(path, _schema())
+        else:
+            self._file = open(path, "wb")
+            self._file.write(_header(0))
+        self.set_level(level)
+
+    def set_level(self, level):
+        """
+        Canvia el llindar de nivell (com a `Tracer`)
+        """
+        self.level = level
+        for name, value in _LEVELS.items():
+            setattr(self, name, self.record if value >= level else _OFF)
+
+    def _code(self, name):
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    def record(self, t, event, entity=-1, value=np.nan, resource=-1):
+        """
+        Afegeix un registre
+        """
+        self._buf.append((t, self._code(event), entity, resource, value))
+        if len(self._buf) >= self.size:
+            self.flush()
+
+    def flush(self):
+        """
+        Escriu el buffer al fitxer
+        """
+        if self._buf:
+            chunk = np.array(self._buf, dtype=RECORD)
+            self._buf = []
+            self.n += len(chunk)
+            if self.parquet:
+                import pyarrow as pa
+                self._file.write_table(pa.Table.from_arrays(
+                    [chunk[name] for name in RECORD.names], schema=_schema()))
+            else:
+                self._file.write(chunk.tobytes())
+                self._file.seek(0)
+                self._file.write(_header(self.n))
+                self._file.seek(0, os.SEEK_END)
+        if not self.parquet:
+            self._file.flush()
+        with open(_names_path(self.path), "w") as f:
+            json.dump(self.names, f)
+
+    def close(self):
+        """
+        Escriu el que queda al buffer i tanca el fitxer
+        """
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.n + len(self._buf)
+
+
+def _schema():
+    import pyarrow as pa
+    return pa.schema([(name, pa.from_numpy_dtype(RECORD[name])) for name in RECORD.names])
+
+
+def open_log(path):
+    """
+    Registres i noms dels esdeveniments d'un fitxer escrit amb `EventLog`
+
+    Els fitxers `.npy` es projecten a memòria i no es llegeixen fins que no
+    se'n fa servir una part.
+    """
+    with open(_names_path(path)) as f:
+        names = json.load(f)
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        table = pq.read_table(path, memory_map=True)
+        records = np.empty(table.num_rows, dtype=RECORD)
+        for name in RECORD.names:
+            records[name] = table.column(name).to_numpy()
+        return records, names
+    return np.load(path, mmap_mode="r"), names
+
+
+def _select(records, names, event):
+    """
+    Registres d'un tipus d'esdeveniment
+    """
+    if event not in names:
+        return records[:0]
+    code = names.index(event)
+    return records[records["esdeveniment"] == code]
+
+
+def counts(records, names):
+    """
+    Nombre de registres de cada tipus d'esdeveniment
+    """
+    n = np.bincount(records["esdeveniment"], minlength=len(names))
+    return pd.Series(n, index=names)
+
+
+def waits(records, names, start, end):
+    """
+    Temps entre el primer esdeveniment `start` i el primer `end` de cada entitat
+
+    Per exemple `waits(rec, noms, "arribada", "venda")` dona l'espera de
+    cada client. Les entitats que no han arribat a `end` no es compten.
+    """
+    a = _select(records, names, start)
+    b = _select(records, names, end)
+    ea, ia = np.unique(a["entitat"], return_index=True)
+    eb, ib = np.unique(b["entitat"], return_index=True)
+    _, ja, jb = np.intersect1d(ea, eb, assume_unique=True, return_indices=True)
+    return b["t"][ib[jb]] - a["t"][ia[ja]]
+
+
+def occupancy(records, names, up, down, until=None, start=0.0):
+    """
+    Mitjana ponderada pel temps del nombre d'entitats entre `up` i `down`
+
+    Cada esdeveniment `up` suma 1 i cada `down` resta 1; per exemple
+    `occupancy(rec, noms, "arribada", "seguent", 300)` és la llargària
+    mitjana de la cua de les taquilles. Amb `start` es descarta l'escalfament.
+    """
+    kinds = records["esdeveniment"]
+    codes = [names.index(e) if e in names else -1 for e in (up, down)]
+    mask = (kinds == codes[0]) | (kinds == codes[1])
+    t = records["t"][mask]
+    step = np.where(kinds[mask] == codes[0], 1, -1)
+    if until is None:
+        until = t[-1] if len(t) else start
+    keep = t <= until
+    level = np.cumsum(step[keep])
+    # El nivell abans de `start` compta des de `start`
+    edges = np.append(np.maximum(t[keep], start), until)
+    return float(np.sum(level * np.diff(edges))) / (until - start)
+
+
+def _config_name(kwargs):
+    """
+    Nom d'una configuració a partir dels seus paràmetres, per exemple `n_taquilles=3,temps=1000`
+    """
+    for key, value in kwargs.items():
+        if not isinstance(value, (str, int, float, bool, type(None))):
+            raise ValueError("el paràmetre {} no és escalar: cal donar `name`".format(key))
+    return ",".join("{}={}".format(k, kwargs[k]) for k in sorted(kwargs))
+
+
+def _stem(prefix, name):
+    return "-".join(part for part in (prefix, name) if part)
+
+
+def run_logged(model, n, directory, seed=None, workers=None, start=0, name=None,
+               prefix="replica", parquet=False, size=65536, **kwargs):
+    """
+    Executa rèpliques com `run_replications` i escriu un registre per rèplica
+
+        run_logged(models.taquilles, 20, "logs", seed=1, temps=10**5)
+
+    El fitxer de la rèplica i és `<prefix>-<name>-<i>.npy`. Per defecte
+    `name` es construeix amb els paràmetres de la configuració, de manera
+    que configuracions diferents no es trepitgen; amb `name=""` no hi és.
+    """
+    from .replication import replication_seeds, run_tasks
+    if name is None:
+        name = _config_name(kwargs)
+    model = _Logged(model, directory, _stem(prefix, name),
+                    ".parquet" if parquet else ".npy", size)
+    seeds = replication_seeds(seed, n, start)
+    tasks = [(model, s, dict(kwargs, replica=i)) for i, s in enumerate(seeds, start)]
+    runs = pd.DataFrame(run_tasks(tasks, workers), index=range(start, start + n))
+    runs.index.name = "replica"
+    return runs
+
+
+class _Logged:
+    """
+    Model amb registre d'esdeveniments (una classe perquè es pugui enviar als processos)
+    """
+
+    def __init__(self, model, directory, stem, ext, size):
+        self.model = model
+        self.directory = directory
+        self.stem = stem
+        self.ext = ext
+        self.size = size
+
+    def __call__(self, rng, replica, **kwargs):
+        path = os.path.join(self.directory, "{}-{:05d}{}".format(self.stem, replica, self.ext))
+        with EventLog(path, self.size) as log:
+            return self.model(rng, tracer=log, **kwargs)
+
+
+def apply(directory, kpis, name=None, prefix="replica", **kwargs):
+    """
+    Calcula `kpis(records, names)` per a cada registre d'una configuració
+
+    La configuració es tria com a `run_logged`, amb `name` o amb els
+    paràmetres del model. Retorna una fila per rèplica, com `run_replications`.
+    """
+    if name is None:
+        name = _config_name(kwargs)
+    pattern = re.compile(re.escape(_stem(prefix, name)) + r"-(\d+)\.(npy|parquet)")
+    rows = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*"))):
+        match = pattern.fullmatch(os.path.basename(path))
+        if match:
+            rows[int(match.group(1))] = kpis(*open_log(path))
+    runs = pd.DataFrame.from_dict(rows, orient="index").sort_index()
+    runs.index.name = "replica"
+    return runs
@@ -0,0 +1,220 @@
+"""
+Motor propi d'esdeveniments per a la fàbrica de la Pràctica 9.
+
+En lloc d'un procés de simpy per encàrrec i estació, el calendari
+d'esdeveniments és un heap binari de tuples (temps, ordre, tipus, encàrrec)
+i cada estació és un comptador de màquines lliures amb una cua FIFO.
+Amb la mateixa descripció de la fàbrica i la mateixa llavor dona els
+mateixos indicadors que `models.fabrica`, amb molt menys cost per
+esdeveniment.
+"""
+from collections import deque
+from heapq import heappop, heappush
+from itertools import accumulate
+
+from . import calqueue
+from .models import ANY, FABRICA, kpis_fabrica, nou_encarrec
+from .variates import Streams
+
+ARRIBADA = 0
+SORTIDA = 1
+
+
+class JobShop:
+    """
+    Fàbrica amb estacions de màquines idèntiques i circuits per producte
+
+        shop = JobShop(FABRICA, rng)
+        shop.run(ANY)
+        shop.report()
+
+    `run` es pot cridar diverses vegades amb horitzons creixents.
+    Un encàrrec és una llista [producte, pas, serveis, espera, entrada a la cua,
+    circuit, acumuladors de servei].
+    Tot l'estat són llistes, tuples i generadors de NumPy, de manera que
+    el motor es pot copiar i desar amb `pickle`.
+    Amb `calendar=CalendarQueue()` el calendari és una cua de calendari en
+    lloc del heap binari (només surt a compte amb milions d'esdeveniments
+    pendents).
+    """
+
+    def __init__(self, fabrica=FABRICA, rng=None, antitetic=None, calendar=None):
+        self.fabrica = fabrica
+        self.streams = Streams(rng, antithetic=antitetic)
+        self._noms = list(fabrica["productes"])
+        self._probs = list(accumulate(fabrica["productes"][n]["p"] for n in self._noms))
+        # Circuits amb estacions numerades des de 0 i claus (producte, estació)
+        self._rutes = {n: [s - 1 for s in p["ruta"]]
+                       for n, p in fabrica["productes"].items()}
+
+        n = len(fabrica["estacions"])
+        self.lliures = list(fabrica["estacions"])
+        self.cues = [deque() for _ in range(n)]
+        # Espera acumulada i clients atesos per estació
+        self._espera_est = [0.0] * n
+        self._n_est = [0] * n
+        # Integral de la capacitat fins a l'últim canvi de màquines
+        self._cap_area = [0.0] * n
+        self._cap_t = [0.0] * n
+        # Sumes i comptadors per producte i per (producte, estació)
+        self._espera = {nom: [0.0, 0] for nom in self._noms}
+        self._servei = {(nom, s + 1): [0.0, 0] for nom, r in self._rutes.items()
+                        for s in r}
+        self._acc = {nom: [self._servei[nom, s + 1] for s in r]
+                     for nom, r in self._rutes.items()}
+
+        self.now = 0.0
+        self.events = 0
+        self._seq = 0
+        if calendar is None:
+            self.calendar = []
+            self._push, self._pop = heappush, heappop
+        else:
+            # Una cua buida amb la interfície de `heapq`
+            self.calendar = calendar
+            self._push, self._pop = calqueue.push, calqueue.pop
+        self._schedule(self.streams["arribades"].exponential(fabrica["arribades"]),
+                       ARRIBADA, None)
+
+    def _schedule(self, t, kind, job):
+        self._push(self.calendar, (t, self._seq, kind, job))
+        self._seq += 1
+
+    def set_machines(self, estacio, n):
+        """
+        Canvia el nombre de màquines d'una estació (numerada des d'1) a l'instant actual
+
+        Si hi ha més màquines, comencen les tasques que esperaven. Si n'hi ha
+        menys, les que treballen acaben la tasca i no se'n substitueixen.
+        """
+        s = estacio - 1
+        estacions = list(self.fabrica["estacions"])
+        self._cap_area[s] += estacions[s] * (self.now - self._cap_t[s])
+        self._cap_t[s] = self.now
+        self.lliures[s] += n - estacions[s]
+        estacions[s] = n
+        self.fabrica = {**self.fabrica, "estacions": estacions}
+        while self.lliures[s] > 0 and self.cues[s]:
+            job = self.cues[s].popleft()
+            espera = self.now - job[4]
+            job[3] += espera
+            self._espera_est[s] += espera
+            self._n_est[s] += 1
+            self.lliures[s] -= 1
+            self._schedule(self.now + job[2][job[1]], SORTIDA, job)
+
+    def run(self, until):
+        """
+        Processa els esdeveniments anteriors a `until`
+
+        No s'integra res a cada esdeveniment: l'àrea sota la cua és la suma
+        de les esperes i l'àrea de màquines ocupades la suma dels serveis,
+        i totes dues es tanquen a `report`.
+        """
+        # Referències locals: el bucle és el camí crític del motor
+        calendar = self.calendar
+        fabrica = self.fabrica
+        streams = self.streams
+        mitjana_arribades = fabrica["arribades"]
+        arribades = streams["arribades"]
+        noms, probs, rutes, accs = self._noms, self._probs, self._rutes, self._acc
+        lliures, cues = self.lliures, self.cues
+        espera_est, n_est = self._espera_est, self._n_est
+        seq = self._seq
+        events = 0
+        heappush, heappop = self._push, self._pop
+
+        while calendar and calendar[0][0] < until:
+            t, _, kind, job = heappop(calendar)
+            events += 1
+
+            if kind == ARRIBADA:
+                nom, serveis = nou_encarrec(streams, fabrica, noms, probs)
+                job = [nom, 0, serveis, 0.0, t, rutes[nom], accs[nom]]
+                heappush(calendar, (t + arribades.exponential(mitjana_arribades),
+                                    seq, ARRIBADA, None))
+                seq += 1
+                s = job[5][0]
+            else:
+                pas = job[1]
+                ruta = job[5]
+                s = ruta[pas]
+                acc = job[6][pas]
+                acc[0] += job[2][pas]
+                acc[1] += 1
+
+                # La màquina que queda lliure passa al primer de la cua
+                cua = cues[s]
+                # (lliures < 0 vol dir que s'han de retirar màquines)
+                if cua and lliures[s] >= 0:
+                    seguent = cua.popleft()
+                    espera = t - seguent[4]
+                    seguent[3] += espera
+                    espera_est[s] += espera
+                    n_est[s] += 1
+                    heappush(calendar, (t + seguent[2][seguent[1]], seq,
+                                        SORTIDA, seguent))
+                    seq += 1
+                else:
+                    lliures[s] += 1
+
+                pas += 1
+                if pas == len(ruta):
+                    acc = self._espera[job[0]]
+                    acc[0] += job[3]
+                    acc[1] += 1
+                    continue
+                job[1] = pas
+                job[4] = t
+                s = ruta[pas]
+
+            # L'encàrrec entra a l'estació `s` del seu circuit
+            if lliures[s] > 0:
+                lliures[s] -= 1
+                n_est[s] += 1
+                heappush(calendar, (t + job[2][job[1]], seq, SORTIDA, job))
+                seq += 1
+            else:
+                cues[s].append(job)
+
+        self._seq = seq
+        self.events += events
+        self.now = until
+
+    def report(self):
+        """
+        Indicadors fins a l'instant actual, amb el format de `models.fabrica`
+        """
+        t = self.now
+        cap = self.fabrica["estacions"]
+        # Esperes dels encàrrecs que encara són a la cua
+        area_cua = [self._espera_est[s] + sum(t - job[4] for job in self.cues[s])
+                    for s in range(len(cap))]
+        # Serveis acabats i part feta dels serveis en curs
+        area_ocupades = [0.0] * len(cap)
+        for (_, s), (x, _) in self._servei.items():
+            area_ocupades[s - 1] += x
+        for sortida, _, kind, job in self.calendar:
+            if kind == SORTIDA:
+                pas = job[1]
+                area_ocupades[job[5][pas]] += t - (sortida - job[2][pas])
+        area_cap = [a + c * (t - t0) for a, c, t0 in zip(self._cap_area, cap, self._cap_t)]
+        return kpis_fabrica(
+            self.fabrica,
+            {nom: (x / n if n else 0.0, n) for nom, (x, n) in self._espera.items()},
+            {key: x / n if n else 0.0 for key, (x, n) in self._servei.items()},
+            [a / t for a in area_cua],
+            [a / c for a, c in zip(area_ocupades, area_cap)],
+            [e / n if n else 0.0 for e, n in zip(self._espera_est, self._n_est)])
+
+
+def fabrica(rng, temps=ANY, fabrica=FABRICA, antitetic=None, calendari=False):
+    """
+    Fàbrica de la Pràctica 9 amb el motor propi, amb la signatura de `models.fabrica`
+
+    Amb `calendari=True` es fa servir una cua de calendari.
+    """
+    shop = JobShop(fabrica, rng, antitetic,
+                   calqueue.CalendarQueue() if calendari else None)
+    shop.run(temps)
+    return shop.report()
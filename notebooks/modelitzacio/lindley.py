@@ -0,0 +1,118 @@
+"""
+Cues FIFO calculades directament a partir dels temps d'arribada i de servei.
+
+En una cua FIFO els temps d'espera no depenen de cap altre esdeveniment:
+amb un servidor segueixen la recurrència de Lindley
+
+    W[i] = max(0, W[i-1] + S[i-1] - A[i])
+
+i amb `c` servidors la de Kiefer-Wolfowitz, sobre el vector ordenat de
+càrrega pendent de cada servidor. Les dues s'avaluen sobre matrius
+(rèpliques x clients), sense cap procés de simpy.
+"""
+import numpy as np
+import pandas as pd
+
+
+def lindley(entre_arribades, serveis):
+    """
+    Temps d'espera d'una cua FIFO amb un servidor
+
+    `entre_arribades[:, i]` és el temps entre l'arribada i-1 i la i (la
+    primera es compta des de t=0) i `serveis[:, i]` el temps de servei del
+    client i. La recurrència es resol amb sumes acumulades:
+    W[i] = P[i] - min(P[:i+1]), amb P les sumes acumulades de S[i-1] - A[i].
+    """
+    entre_arribades = np.atleast_2d(entre_arribades)
+    serveis = np.atleast_2d(serveis)
+    x = serveis[:, :-1] - entre_arribades[:, 1:]
+    p = np.zeros(serveis.shape)
+    np.cumsum(x, axis=1, out=p[:, 1:])
+    return p - np.minimum.accumulate(p, axis=1)
+
+
+def kiefer_wolfowitz(entre_arribades, serveis, c):
+    """
+    Temps d'espera d'una cua FIFO amb `c` servidors
+
+    Es manté, per a cada rèplica, la càrrega pendent de cada servidor
+    ordenada de menor a major. El client espera la menor càrrega i hi afegeix
+    el seu temps de servei.
+    """
+    entre_arribades = np.atleast_2d(entre_arribades)
+    serveis = np.atleast_2d(serveis)
+    if c == 1:
+        return lindley(entre_arribades, serveis)
+    n_rep, n = serveis.shape
+    carrega = np.zeros((n_rep, c))
+    esperes = np.empty((n_rep, n))
+    for i in range(n):
+        carrega -= entre_arribades[:, i, None]
+        np.maximum(carrega, 0, out=carrega)
+        esperes[:, i] = carrega[:, 0]
+        carrega[:, 0] += serveis[:, i]
+        carrega.sort(axis=1)
+    return esperes
+
+
+def fifo_kpis(entre_arribades, serveis, c=1, temps=None):
+    """
+    Indicadors de la cua FIFO fins a l'instant `temps`
+
+    Retorna els mateixos indicadors que `models.taquilles`: persones al
+    sistema (mitjana ponderada pel temps i màxim), espera mitjana dels
+    clients que han començat el servei, ocupació dels servidors i nombre
+    de clients atesos.
+    """
+    entre_arribades = np.atleast_2d(entre_arribades)
+    serveis = np.atleast_2d(serveis)
+    arribada = np.cumsum(entre_arribades, axis=1)
+    if temps is None:
+        temps = arribada[:, -1].min()
+    elif np.any(arribada[:, -1] < temps):
+        raise ValueError("no hi ha prou clients per cobrir l'horitzó de simulació")
+
+    esperes = kiefer_wolfowitz(entre_arribades, serveis, c)
+    inici = arribada + esperes
+    sortida = inici + serveis
+
+    a = np.minimum(arribada, temps)
+    s = np.minimum(inici, temps)
+    d = np.minimum(sortida, temps)
+    atesos = inici < temps
+    clients = atesos.sum(axis=1)
+
+    # Màxim de persones al sistema: s'ordenen arribades (+1) i sortides (-1)
+    t = np.concatenate([arribada, sortida], axis=1)
+    delta = np.concatenate([np.ones_like(arribada), -np.ones_like(sortida)], axis=1)
+    ordre = np.argsort(t, axis=1, kind="stable")
+    t = np.take_along_axis(t, ordre, axis=1)
+    pers = np.cumsum(np.take_along_axis(delta, ordre, axis=1), axis=1)
+    cua_max = np.where(t < temps, pers, 0).max(axis=1)
+
+    return pd.DataFrame({
+        "cua": (d - a).sum(axis=1) / temps,
+        "cua_max": cua_max,
+        "espera": np.where(atesos, esperes, 0).sum(axis=1) / np.maximum(clients, 1),
+        "ocupacio": (d - s).sum(axis=1) / (c * temps),
+        "clients": clients,
+    })
+
+
+def taquilles(rng, n, n_taquilles=2, temps=300, arribades=8, servei=10):
+    """
+    `n` rèpliques de la venda per taquilla, calculades amb la recurrència
+
+    Es generen prou clients per cobrir l'horitzó `temps` a totes les
+    rèpliques. El resultat té una fila per rèplica, com `run_replications`.
+    """
+    mitjana = temps / arribades
+    m = int(mitjana + 6 * np.sqrt(mitjana) + 10)
+    entre_arribades = rng.exponential(arribades, (n, m))
+    while np.any(entre_arribades.sum(axis=1) < temps):
+        entre_arribades = np.concatenate(
+            [entre_arribades, rng.exponential(arribades, (n, m))], axis=1)
+    serveis = rng.exponential(servei, entre_arribades.shape)
+    runs = fifo_kpis(entre_arribades, serveis, n_taquilles, temps)
+    runs.index.name = "replica"
+    return runs
@@ -0,0 +1,405 @@
+"""
+Cadenes de Markov de temps discret sobre matrius disperses.
+
+Les preguntes de l'Exercici 3 de la Pràctica 8 (irreductibilitat,
+periodicitat, distribució després de n passes i distribució estacionària)
+es responen aquí sense construir mai la matriu densa, de manera que es
+poden estudiar cadenes amb milions d'estats:
+
+- les classes comunicants són les components fortament connexes del graf
+  de transicions, i una classe és tancada si no en surt cap transició;
+- el període d'una classe és el màxim comú divisor de
+  `nivell[u] + 1 - nivell[v]` per a les transicions u -> v de la classe,
+  amb els nivells d'un recorregut en amplada;
+- la distribució després de n passes es calcula amb productes
+  vector-matriu (o elevant la matriu al quadrat repetidament);
+- la distribució estacionària, amb el mètode de la potència o amb un
+  solucionador de valors propis dispers.
+
+Per comprovar els resultats per simulació, `PathSampler` fa avançar molts
+camins independents alhora amb taules d'àlies de Walker (un sol nombre
+aleatori per camí i pas) i en dona l'ocupació empírica i els temps
+d'arribada a un conjunt d'estats.
+
+    P = markov.transition_matrix([[0, 1, 0], [0.5, 0, 0.5], [0, 1, 0]])
+    markov.classes(P)
+    markov.distribution(P, 0, 3)
+    markov.stationary(P)
+    markov.PathSampler(P).occupancy(rng, 0, 1000)
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse, stats
+from scipy.sparse import csgraph
+from scipy.sparse.linalg import eigs
+
+
+def transition_matrix(P, n=None, tol=1e-9):
+    """
+    Matriu de transició dispersa (CSR) a partir d'una matriu o d'un diccionari
+
+    `P` pot ser una matriu densa o dispersa, o un diccionari
+    `{(i, j): p}` amb `n` estats. Es comprova que les files sumin 1.
+    """
+    if isinstance(P, dict):
+        if n is None:
+            n = 1 + max(max(i, j) for i, j in P)
+        ij = np.array(list(P), dtype=np.int64).reshape(-1, 2)
+        P = sparse.coo_matrix((np.fromiter(P.values(), float, len(P)), (ij[:, 0], ij[:, 1])),
+                              shape=(n, n))
+    P = sparse.csr_matrix(P, dtype=float)
+    P.sum_duplicates()
+    P.eliminate_zeros()
+    if P.shape[0] != P.shape[1]:
+        raise ValueError("la matriu de transició ha de ser quadrada")
+    if P.nnz and P.data.min() < 0:
+        raise ValueError("hi ha probabilitats de transició negatives")
+    rows = np.asarray(P.sum(axis=1)).ravel()
+    if np.any(np.abs(rows - 1) > tol):
+        bad = np.flatnonzero(np.abs(rows - 1) > tol)
+        raise ValueError("les files {} no sumen 1".format(bad[:10].tolist()))
+    return P
+
+
+def _levels(P, labels):
+    """
+    Nivells d'un recorregut en amplada dins de cada classe, des d'un estat de la classe
+    """
+    # Només les transicions internes de cada classe
+    coo = P.tocoo()
+    inner = labels[coo.row] == labels[coo.col]
+    G = sparse.csr_matrix((np.ones(inner.sum()), (coo.row[inner], coo.col[inner])),
+                          shape=P.shape)
+    _, first = np.unique(labels, return_index=True)
+    levels = csgraph.dijkstra(G, indices=first, unweighted=True, min_only=True)
+    return levels, coo.row[inner], coo.col[inner]
+
+
+def _periods(P, labels, n_classes):
+    """
+    Període de cada classe (0 si la classe no té cap transició interna)
+    """
+    levels, u, v = _levels(P, labels)
+    diff = np.abs(levels[u] + 1 - levels[v]).astype(np.int64)
+    out = np.zeros(n_classes, dtype=np.int64)
+    if len(diff):
+        order = np.argsort(labels[u], kind="stable")
+        lab = labels[u][order]
+        starts = np.flatnonzero(np.r_[True, lab[1:] != lab[:-1]])
+        out[lab[starts]] = np.gcd.reduceat(diff[order], starts)
+    return out
+
+
+def classes(P):
+    """
+    Classes comunicants: estats, si és tancada (recurrent) i període
+
+    Retorna una fila per classe; l'atribut `labels` del resultat dona la
+    classe de cada estat.
+    """
+    P = sparse.csr_matrix(P)
+    n_classes, labels = csgraph.connected_components(P, directed=True, connection="strong")
+    coo = P.tocoo()
+    # Una classe és oberta si alguna transició en surt
+    leaves = labels[coo.row] != labels[coo.col]
+    oberta = np.zeros(n_classes, dtype=bool)
+    oberta[labels[coo.row[leaves]]] = True
+    df = pd.DataFrame({
+        "estats": np.bincount(labels, minlength=n_classes),
+        "tancada": ~oberta,
+        "periode": _periods(P, labels, n_classes),
+    })
+    df.index.name = "classe"
+    df.attrs["labels"] = labels
+    return df
+
+
+def is_irreducible(P):
+    """
+    Cert si tots els estats es comuniquen entre ells
+    """
+    n_classes, _ = csgraph.connected_components(P, directed=True, connection="strong")
+    return n_classes == 1
+
+
+def period(P):
+    """
+    Període d'una cadena irreductible
+    """
+    n_classes, labels = csgraph.connected_components(P, directed=True, connection="strong")
+    if n_classes != 1:
+        raise ValueError("la cadena no és irreductible; feu servir `classes`")
+    return int(_periods(sparse.csr_matrix(P), labels, 1)[0])
+
+
+def is_aperiodic(P):
+    """
+    Cert si la cadena és irreductible i de període 1
+    """
+    return is_irreducible(P) and period(P) == 1
+
+
+def _initial(p0, n):
+    if np.isscalar(p0):
+        x = np.zeros(n)
+        x[int(p0)] = 1.0
+        return x
+    return np.asarray(p0, dtype=float)
+
+
+def matrix_power(P, n):
+    """
+    `P` elevada a `n` amb quadrats successius (log2(n) productes de matrius disperses)
+
+    Convé per a cadenes petites o molt disperses: les potències s'omplen.
+    """
+    P = sparse.csr_matrix(P)
+    result = sparse.identity(P.shape[0], format="csr")
+    while n:
+        if n & 1:
+            result = result @ P
+        n >>= 1
+        if n:
+            P = P @ P
+    return result
+
+
+def distribution(P, p0, n, squaring=False):
+    """
+    Distribució després de `n` passes des de `p0` (un estat o un vector de probabilitats)
+
+    Per defecte es fan `n` productes vector-matriu, que només costen tant com
+    els elements no nuls de `P`. Amb `squaring` es calcula abans `P^n`.
+    """
+    P = sparse.csr_matrix(P)
+    x = _initial(p0, P.shape[0])
+    if squaring:
+        return matrix_power(P, n).T @ x
+    # x P = (P^T x)^T; la transposada en CSR fa els productes més ràpids
+    PT = P.T.tocsr()
+    for _ in range(n):
+        x = PT @ x
+    return x
+
+
+def stationary(P, method="auto", tol=1e-12, max_iter=1000, p0=None):
+    """
+    Distribució estacionària pi = pi P, amb suma 1
+
+    `method` pot ser `potencia` (mètode de la potència), `eigs` (Arnoldi
+    amb desplaçament i inversió a prop del valor propi 1) o `auto`, que
+    prova primer la potència i, si no convergeix en `max_iter` iteracions,
+    passa a `eigs`. Si la cadena és periòdica, la potència s'aplica a la
+    cadena mandrosa (P + I) / 2, que té la mateixa distribució estacionària.
+    Si hi ha més d'una classe tancada la distribució no és única i es
+    produeix un error.
+    """
+    P = transition_matrix(P)
+    info = classes(P)
+    if info["tancada"].sum() != 1:
+        raise ValueError("hi ha {} classes tancades: la distribució estacionària no és única"
+                         .format(info["tancada"].sum()))
+    n = P.shape[0]
+    PT = P.T.tocsr()
+    if method in ("auto", "potencia"):
+        lazy = info.loc[info["tancada"], "periode"].iloc[0] != 1
+        x = np.full(n, 1.0 / n) if p0 is None else _initial(p0, n)
+        for _ in range(max_iter):
+            y = PT @ x
+            if lazy:
+                y = 0.5 * (x + y)
+            err = np.abs(y - x).sum()
+            x = y
+            if err < tol:
+                return x / x.sum()
+        if method == "potencia":
+            raise RuntimeError("el mètode de la potència no ha convergit en {} iteracions "
+                               "(error {:.2e})".format(max_iter, err))
+    elif method != "eigs":
+        raise ValueError("mètode desconegut: {}".format(method))
+    # Desplaçament una mica per sobre d'1 perquè P^T - sigma I no sigui singular
+    _, v = eigs(PT, k=1, sigma=1 + 1e-9, tol=tol)
+    x = np.abs(v[:, 0].real)
+    return x / x.sum()
+
+
+# Files amb més transicions que aquest valor es preparen una per una
+_BLOCK = 32
+
+
+def _alias_block(q):
+    """
+    Taules d'àlies de moltes files amb el mateix nombre de transicions
+
+    `q` són les probabilitats multiplicades pel nombre de columnes. A cada
+    pas, a totes les files alhora, la columna pendent més petita es
+    completa amb la més gran, que passa a ser-ne l'àlies.
+    """
+    r, k = q.shape
+    q = q.copy()
+    prob = np.ones((r, k))
+    alias = np.tile(np.arange(k), (r, 1))
+    done = np.zeros((r, k), dtype=bool)
+    rows = np.arange(r)
+    for _ in range(k - 1):
+        s = np.argmin(np.where(done, np.inf, q), axis=1)
+        big = np.argmax(np.where(done, -np.inf, q), axis=1)
+        prob[rows, s] = q[rows, s]
+        alias[rows, s] = big
+        done[rows, s] = True
+        q[rows, big] -= 1 - q[rows, s]
+    return prob, alias
+
+
+def _vose(q):
+    """
+    Taula d'àlies d'una sola fila (mètode de Vose, cost lineal)
+    """
+    k = len(q)
+    q = list(q)
+    prob = np.ones(k)
+    alias = np.arange(k)
+    small = [i for i in range(k) if q[i] < 1]
+    large = [i for i in range(k) if q[i] >= 1]
+    while small and large:
+        s, big = small.pop(), large[-1]
+        prob[s] = q[s]
+        alias[s] = big
+        q[big] -= 1 - q[s]
+        if q[big] < 1:
+            small.append(large.pop())
+    return prob, alias
+
+
+class PathSampler:
+    """
+    Simulació vectoritzada de camins d'una cadena de Markov amb taules d'àlies
+
+    Les taules tenen la mateixa disposició que les transicions de la matriu
+    CSR: per avançar un camí des de l'estat i es tria una de les k
+    transicions de la fila i uniformement i, amb probabilitat `1 - prob`,
+    se'n pren l'àlies.
+    """
+
+    def __init__(self, P):
+        P = transition_matrix(P)
+        self.P = P
+        self.indptr = P.indptr
+        self.indices = P.indices
+        k = np.diff(P.indptr)
+        self.k = k
+        self.prob = np.ones(P.nnz)
+        # Àlies com a posició dins de `indices`
+        self.alias = np.arange(P.nnz)
+        for K in np.unique(k):
+            rows = np.flatnonzero(k == K)
+            if K <= _BLOCK:
+                pos = P.indptr[rows][:, None] + np.arange(K)
+                prob, alias = _alias_block(P.data[pos] * K)
+                self.prob[pos] = prob
+                self.alias[pos] = np.take_along_axis(pos, alias, axis=1)
+            else:
+                for i in rows:
+                    a, b = P.indptr[i], P.indptr[i + 1]
+                    prob, alias = _vose(P.data[a:b] * K)
+                    self.prob[a:b] = prob
+                    self.alias[a:b] = a + alias
+
+    @property
+    def n_states(self):
+        return self.P.shape[0]
+
+    def step(self, x, rng):
+        """
+        Estat següent de cada camí (`x` és un vector d'estats)
+        """
+        k = self.k[x]
+        # La part entera tria la columna i la part fraccionària decideix l'àlies
+        u = rng.random(len(x)) * k
+        j = np.minimum(u.astype(np.int64), k - 1)
+        pos = self.indptr[x] + j
+        pos = np.where(u - j < self.prob[pos], pos, self.alias[pos])
+        return self.indices[pos]
+
+    def _start(self, start, n):
+        # Un estat per a tots els camins o un vector amb l'estat inicial de cada camí
+        if np.isscalar(start):
+            return np.full(n, start, dtype=np.int64)
+        return np.array(start, dtype=np.int64)
+
+    def paths(self, rng, start, steps, n=1000):
+        """
+        Matriu (camins x passes + 1) d'estats des de `start` (un estat o un per camí)
+        """
+        x = self._start(start, n)
+        out = np.empty((len(x), steps + 1), dtype=np.int64)
+        out[:, 0] = x
+        for t in range(1, steps + 1):
+            x = out[:, t] = self.step(x, rng)
+        return out
+
+    def occupancy(self, rng, start, steps, n=1000, burn=0):
+        """
+        Fracció del temps que els camins passen a cada estat, després de `burn` passes
+        """
+        x = self._start(start, n)
+        for _ in range(burn):
+            x = self.step(x, rng)
+        counts = np.zeros(self.n_states, dtype=np.int64)
+        # Els estats visitats es compten per blocs de passes
+        block = max(1, min(steps, 2**20 // len(x)))
+        buf = np.empty((block, len(x)), dtype=np.int64)
+        for t in range(0, steps, block):
+            m = min(block, steps - t)
+            for j in range(m):
+                x = buf[j] = self.step(x, rng)
+            counts += np.bincount(buf[:m].ravel(), minlength=self.n_states)
+        return counts / (len(x) * steps)
+
+    def hitting_times(self, rng, start, target, n=1000, max_steps=10**5):
+        """
+        Passes fins arribar per primer cop a `target` (un estat o una llista d'estats)
+
+        Els camins que ja comencen a `target` hi arriben en 0 passes; els que
+        no hi arriben en `max_steps` passes tenen temps infinit.
+        """
+        hit = np.zeros(self.n_states, dtype=bool)
+        hit[np.atleast_1d(target)] = True
+        x = self._start(start, n)
+        times = np.full(len(x), np.inf)
+        times[hit[x]] = 0
+        # Només s'avancen els camins que encara no hi han arribat
+        active = np.flatnonzero(~hit[x])
+        x = x[active]
+        for t in range(1, max_steps + 1):
+            if not len(active):
+                break
+            x = self.step(x, rng)
+            arrived = hit[x]
+            times[active[arrived]] = t
+            active, x = active[~arrived], x[~arrived]
+        return times
+
+
+def hitting_summary(times, alpha=0.05):
+    """
+    Resum dels temps d'arribada: mitjana, interval de confiança i percentils
+
+    Els camins que no hi han arribat es compten a `no_arriben` i no entren
+    a la mitjana.
+    """
+    times = np.asarray(times, dtype=float)
+    ok = times[np.isfinite(times)]
+    n = len(ok)
+    mean = ok.mean() if n else np.nan
+    sd = ok.std(ddof=1) if n > 1 else np.nan
+    half = stats.t.ppf(1 - alpha / 2, n - 1) * sd / np.sqrt(n) if n > 1 else np.nan
+    return pd.Series({
+        "mitjana": mean,
+        "semiamplada": half,
+        "mediana": np.median(ok) if n else np.nan,
+        "p90": np.percentile(ok, 90) if n else np.nan,
+        "maxim": ok.max() if n else np.nan,
+        "camins": len(times),
+        "no_arriben": len(times) - n,
+    })
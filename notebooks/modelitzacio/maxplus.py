@@ -0,0 +1,188 @@
+"""
+Línies de producció en sèrie (flow shop) calculades amb l'àlgebra max-plus.
+
+Quan tots els encàrrecs passen per les estacions en el mateix ordre i
+cada estació és una cua FIFO, els instants de sortida no depenen de cap
+altre esdeveniment. Amb una màquina,
+
+    D[i, s] = max(A[i, s], D[i-1, s]) + S[i, s],    A[i, s+1] = D[i, s]
+
+que en àlgebra max-plus és un producte de matrius i es resol amb sumes i
+màxims acumulats. Amb c màquines es manté, per a cada rèplica, el vector
+ordenat dels instants en què cada màquina queda lliure; com que un encàrrec
+pot avançar-ne un altre, a l'estació següent els encàrrecs es reordenen
+per instant d'arribada.
+
+Tot s'avalua sobre matrius (rèpliques x encàrrecs). Les rèpliques poden
+tenir un nombre de màquines diferent a cada estació, de manera que milers
+de configuracions d'una línia s'avaluen d'un sol cop amb els mateixos
+encàrrecs (nombres aleatoris comuns).
+"""
+import numpy as np
+import pandas as pd
+
+from .models import ANY
+
+# Variant en sèrie de la fàbrica de la Pràctica 9: el circuit del producte C,
+# l'únic que passa per totes les estacions en ordre (temps en hores)
+LINIA = {
+    "estacions": [2, 1, 3, 3, 4],
+    "temps": [1.20, 0.25, 0.70, 0.90, 1.00],
+    "arribades": 1.0,
+    "k": 2,
+}
+
+
+def _stations(arribades, serveis, servidors):
+    """
+    Arribada, inici i sortida de cada encàrrec a cada estació, estació per estació
+
+    Les matrius retornades són (rèpliques x encàrrecs), amb els encàrrecs
+    en l'ordre d'entrada a la línia.
+    """
+    n_rep, n, m = serveis.shape
+    servidors = np.broadcast_to(np.asarray(servidors), (n_rep, m))
+    rows = np.arange(n_rep)[:, None]
+    a = arribades
+    for s in range(m):
+        # Ordre d'arribada a l'estació (pot canviar si hi ha avançaments)
+        order = np.argsort(a, axis=1, kind="stable")
+        a_s = np.take_along_axis(a, order, axis=1)
+        srv = np.take_along_axis(serveis[:, :, s], order, axis=1)
+        c = servidors[:, s]
+        if np.all(c == 1):
+            # D[i] = C[i] + max_{k<=i}(A[k] - C[k-1]), amb C les sumes acumulades de S
+            cum = np.cumsum(srv, axis=1)
+            d = cum + np.maximum.accumulate(a_s - (cum - srv), axis=1)
+        else:
+            # Instants en què queda lliure cada màquina, ordenats (màquines x rèpliques);
+            # les màquines que no té la configuració no queden mai lliures
+            cmax = c.max()
+            lliure = np.zeros((cmax, n_rep))
+            lliure[np.arange(cmax)[:, None] >= c[None, :]] = np.inf
+            a_t = np.ascontiguousarray(a_s.T)
+            srv_t = np.ascontiguousarray(srv.T)
+            d_t = np.empty((n, n_rep))
+            tmp = np.empty(n_rep)
+            for i in range(n):
+                x = d_t[i]
+                np.maximum(a_t[i], lliure[0], out=x)
+                x += srv_t[i]
+                # La màquina que s'ocupa passa al seu lloc en l'ordre (inserció)
+                lliure[0] = x
+                for j in range(cmax - 1):
+                    np.minimum(lliure[j], lliure[j + 1], out=tmp)
+                    np.maximum(lliure[j], lliure[j + 1], out=lliure[j + 1])
+                    lliure[j] = tmp
+            d = d_t.T
+        inici = np.empty_like(a)
+        sortida = np.empty_like(a)
+        inici[rows, order] = d - srv
+        sortida[rows, order] = d
+        yield a, inici, sortida
+        a = sortida
+
+
+def tandem(arribades, serveis, servidors):
+    """
+    Instants d'inici i de sortida de cada encàrrec a cada estació
+
+    `arribades` són els instants d'entrada a la línia (rèpliques x encàrrecs),
+    `serveis` els temps de servei (rèpliques x encàrrecs x estacions) i
+    `servidors` les màquines de cada estació, iguals per a totes les
+    rèpliques o una fila per rèplica. Retorna dues matrius de la forma de
+    `serveis`.
+    """
+    arribades = np.atleast_2d(arribades)
+    inici = np.empty(serveis.shape)
+    sortida = np.empty(serveis.shape)
+    for s, (_, i, d) in enumerate(_stations(arribades, serveis, servidors)):
+        inici[:, :, s] = i
+        sortida[:, :, s] = d
+    return inici, sortida
+
+
+def line_kpis(arribades, serveis, servidors, temps):
+    """
+    Indicadors de la línia fins a l'instant `temps`, una fila per rèplica
+
+    `rendiment` són els encàrrecs acabats per unitat de temps, `wip` el
+    nombre mitjà d'encàrrecs a la línia, `espera` l'espera total mitjana
+    dels encàrrecs acabats; per estació, la cua (sense els que són atesos),
+    l'ocupació i l'espera mitjana.
+    """
+    arribades = np.atleast_2d(arribades)
+    n_rep, n, m = serveis.shape
+    servidors = np.broadcast_to(np.asarray(servidors), (n_rep, m))
+    if np.any(arribades[:, -1] < temps):
+        raise ValueError("no hi ha prou encàrrecs per cobrir l'horitzó de simulació")
+    out = {}
+    espera = np.zeros(arribades.shape)
+    for s, (a, i, d) in enumerate(_stations(arribades, serveis, servidors)):
+        espera += i - a
+        a_t, i_t, d_t = (np.minimum(x, temps) for x in (a, i, d))
+        comencats = i < temps
+        out["cua_{}".format(s + 1)] = (i_t - a_t).sum(axis=1) / temps
+        out["ocupacio_{}".format(s + 1)] = (d_t - i_t).sum(axis=1) / (servidors[:, s] * temps)
+        out["espera_est_{}".format(s + 1)] = (np.where(comencats, i - a, 0).sum(axis=1)
+                                              / np.maximum(comencats.sum(axis=1), 1))
+    acabats = d < temps
+    n_acabats = acabats.sum(axis=1)
+    first = {
+        "rendiment": n_acabats / temps,
+        "wip": (np.minimum(d, temps) - np.minimum(arribades, temps)).sum(axis=1) / temps,
+        "espera": np.where(acabats, espera, 0).sum(axis=1) / np.maximum(n_acabats, 1),
+        "encarrecs": n_acabats,
+    }
+    return pd.DataFrame({**first, **out})
+
+
+def _sample(rng, n, temps, linia):
+    """
+    Arribades i serveis Erlang de `n` rèpliques, prou llargues per cobrir `temps`
+    """
+    mitjana = temps / linia["arribades"]
+    m = int(mitjana + 6 * np.sqrt(mitjana) + 10)
+    entre = rng.exponential(linia["arribades"], (n, m))
+    while np.any(entre.sum(axis=1) < temps):
+        entre = np.concatenate([entre, rng.exponential(linia["arribades"], (n, m))], axis=1)
+    k = linia["k"]
+    serveis = rng.gamma(k, 1.0 / k, entre.shape + (len(linia["temps"]),)) * linia["temps"]
+    return np.cumsum(entre, axis=1), serveis
+
+
+def linia(rng, n, temps=ANY, linia=LINIA):
+    """
+    `n` rèpliques de la línia en sèrie, amb una fila per rèplica com `run_replications`
+    """
+    arribades, serveis = _sample(rng, n, temps, linia)
+    runs = line_kpis(arribades, serveis, linia["estacions"], temps)
+    runs.index.name = "replica"
+    return runs
+
+
+def linies(rng, n, configs, temps=ANY, linia=LINIA, block=4096):
+    """
+    `n` rèpliques de moltes configuracions de màquines de la línia
+
+    `configs` és un diccionari nom -> màquines per estació (o nom ->
+    `{"estacions": [...]}`, com els que dona `grid`). Totes les
+    configuracions fan servir els mateixos encàrrecs (nombres aleatoris
+    comuns). Les configuracions s'avaluen per blocs de fins a `block`
+    rèpliques per limitar la memòria. Retorna una fila per configuració i
+    rèplica.
+    """
+    arribades, serveis = _sample(rng, n, temps, linia)
+    names = list(configs)
+    per_block = max(1, block // n)
+    frames = []
+    for j in range(0, len(names), per_block):
+        chunk = names[j:j + per_block]
+        servidors = np.repeat(np.array([configs[c]["estacions"] if isinstance(configs[c], dict)
+                                        else configs[c] for c in chunk]), n, axis=0)
+        runs = line_kpis(np.tile(arribades, (len(chunk), 1)),
+                         np.tile(serveis, (len(chunk), 1, 1)), servidors, temps)
+        runs.index = pd.MultiIndex.from_product([chunk, range(n)],
+                                                names=["configuracio", "replica"])
+        frames.append(runs)
+    return pd.concat(frames)
@@ -0,0 +1,330 @@
+"""
+Models de referència dels notebooks de simulació d'esdeveniments discrets.
+
+Cada model rep un generador `np.random.Generator` i els paràmetres del
+sistema, i retorna un diccionari amb els indicadors (KPI) de la simulació.
+Aquesta és la forma que esperen els executors de rèpliques.
+Dins del model, cada font d'aleatorietat té el seu propi flux (`Streams`)
+i els atributs aleatoris de cada entitat es decideixen quan arriba, de manera
+que configuracions diferents del sistema veuen les mateixes entitats
+(nombres aleatoris comuns). El paràmetre `antitetic` tria el mode dels
+fluxos (vegeu `VariateStream`).
+"""
+from bisect import bisect_right
+from itertools import accumulate
+
+import simpy
+
+from .monitor import ResourceMonitor, Tally, TimeWeighted
+from .resources import ResourceSet
+from .steady import BatchSeries, BinnedSeries, run_until_precision
+from .tracer import NULL
+from .variates import Streams
+
+
+def venda(env, taquilla, cua, temps, client, tracer):
+    """
+    Simula el procés de venda
+    """
+    with taquilla.request() as req:
+        yield req
+        if tracer.debug:
+            tracer.debug(env.now, "venda", client, temps)
+        yield env.timeout(temps)
+        cua.add(-1)
+        if tracer.debug:
+            tracer.debug(env.now, "seguent", client)
+
+
+def arribada(env, taquilla, cua, entre_arribades, serveis, tracer):
+    """
+    Simula el procés d'arribada
+
+    El temps de servei es decideix quan arriba el client.
+    """
+    # Comença l'arribada de clients
+    for client, temps in enumerate(entre_arribades):
+        yield env.timeout(temps)
+        cua.add(1)
+        if tracer.debug:
+            tracer.debug(env.now, "arribada", client, cua.value)
+        env.process(venda(env, taquilla, cua, next(serveis), client, tracer))
+
+
+def taquilles(rng, n_taquilles=2, temps=300, arribades=8, servei=10,
+              entre_arribades=None, serveis=None, tracer=NULL, antitetic=None,
+              entorn=simpy.Environment):
+    """
+    Venda per taquilla (cua FIFO amb `n_taquilles` servidors)
+
+    Retorna la llargària mitjana de la cua (persones al sistema), el temps
+    mitjà d'espera i l'ocupació de les taquilles.
+    Si es donen `entre_arribades` i `serveis`, es fan servir aquests temps
+    en lloc de generar-los (simulació dirigida per traça).
+    Els esdeveniments es poden seguir amb un `Tracer` de nivell DEBUG.
+    `entorn` és la classe de l'entorn de simpy.
+    """
+    streams = Streams(rng, antithetic=antitetic)
+    if entre_arribades is None:
+        entre_arribades = streams["arribades"].exponentials(arribades)
+    if serveis is None:
+        serveis = streams["serveis"].exponentials(servei)
+
+    env = entorn()
+    taquilla = simpy.Resource(env, capacity=n_taquilles)
+    mon = ResourceMonitor(taquilla)
+    # La cua comença buida
+    cua = TimeWeighted(env, 0)
+
+    env.process(arribada(env, taquilla, cua, iter(entre_arribades), iter(serveis),
+                         tracer))
+    env.run(until=temps)
+
+    pers = cua.report(temps)
+    ocupacio = mon.report(temps)
+    return {
+        "cua": pers["mitjana"],
+        "cua_max": pers["max"],
+        "espera": ocupacio["espera_mitjana"],
+        "ocupacio": ocupacio["ocupacio"],
+        "clients": ocupacio["espera_n"],
+    }
+
+
+def taquilles_estacionari(rng, n_taquilles=2, arribades=8, servei=10, precisio=0.05,
+                          interval=1000, temps_max=10**7, alpha=0.05, antitetic=None):
+    """
+    Venda per taquilla en règim estacionari
+
+    La simulació descarta l'escalfament (MSER-5) i s'atura quan la cua i
+    l'espera tenen la precisió relativa demanada, o a `temps_max`.
+    """
+    streams = Streams(rng, antithetic=antitetic)
+    env = simpy.Environment()
+    taquilla = simpy.Resource(env, capacity=n_taquilles)
+    espera = BatchSeries(5)
+    ResourceMonitor(taquilla, wait=espera)
+    # Mitjanes de la cua en intervals d'una desena part de `interval`
+    cua = BinnedSeries(env, interval / 10)
+
+    env.process(arribada(env, taquilla, cua,
+                         streams["arribades"].exponentials(arribades),
+                         streams["serveis"].exponentials(servei), NULL))
+    res = run_until_precision(env, {"cua": cua, "espera": espera},
+                              precision=precisio, interval=interval,
+                              until=temps_max, alpha=alpha)
+
+    est = res["estimacions"]
+    return {
+        "cua": est["cua"]["mitjana"],
+        "cua_semiamplada": est["cua"]["semiamplada"],
+        "espera": est["espera"]["mitjana"],
+        "espera_semiamplada": est["espera"]["semiamplada"],
+        "escalfament": est["cua"]["escalfament"] * cua.width,
+        "temps": res["temps"],
+        "precisio": res["precisio"],
+    }
+
+
+def tasca(env, recursos, temps, stats, id_tasca, tracer):
+    """
+    Simula una tasca del taller: preparació, procés i, a vegades, reparació
+
+    `temps` són els temps de preparació, procés i reparació de la tasca
+    (la reparació és None si la màquina no falla).
+    """
+    preparacio, proces, reparacio = temps
+    arribada = env.now
+    stats["cua"].add(1)
+    # La preparació necessita alhora una màquina i un operari
+    with recursos.acquire(maquina=1, operari=1, priority=1) as req:
+        yield req
+        stats["cua"].add(-1)
+        stats["espera"].add(env.now - arribada)
+        if tracer.debug:
+            tracer.debug(env.now, "preparacio", id_tasca)
+        yield env.timeout(preparacio)
+        recursos.release(req, operari=1)
+
+        yield env.timeout(proces)
+
+        # La reparació necessita dos operaris alhora
+        if reparacio is not None:
+            with recursos.acquire(operari=2, priority=0) as rep:
+                yield rep
+                if tracer.debug:
+                    tracer.debug(env.now, "reparacio", id_tasca)
+                yield env.timeout(reparacio)
+            stats["reparacions"] += 1
+    stats["tasques"] += 1
+    if tracer.debug:
+        tracer.debug(env.now, "fi", id_tasca)
+
+
+def encarrecs(env, recursos, streams, params, stats, tracer):
+    """
+    Simula l'arribada de tasques al taller
+    """
+    arribades = streams["arribades"]
+    id_tasca = 0
+    while True:
+        yield env.timeout(arribades.exponential(params["arribades"]))
+        if tracer.debug:
+            tracer.debug(env.now, "arribada", id_tasca)
+        # Els temps de la tasca es decideixen quan arriba
+        temps = (streams["preparacio"].exponential(params["preparacio"]),
+                 streams["proces"].exponential(params["proces"]),
+                 streams["reparacio"].exponential(params["reparacio"]))
+        if streams["avaries"].random() >= params["p_reparacio"]:
+            temps = temps[:2] + (None,)
+        env.process(tasca(env, recursos, temps, stats, id_tasca, tracer))
+        id_tasca += 1
+
+
+def taller(rng, n_maquines=5, n_operaris=3, temps=7 * 24 * 60, arribades=12,
+           proces=60, preparacio=20, reparacio=30, p_reparacio=0.2, tracer=NULL,
+           antitetic=None, entorn=simpy.Environment):
+    """
+    Taller amb màquines i operaris de la Pràctica 8 (temps en minuts)
+
+    La preparació pren una màquina i un operari alhora i la reparació dos
+    operaris alhora (`ResourceSet`). Les reparacions passen davant de les
+    preparacions, en ordre estricte: així una reparació no queda mai
+    endarrerida per les preparacions, que només necessiten un operari, i
+    no hi ha bloquejos, perquè una reparació només espera operaris i
+    aquests sempre s'acaben alliberant. (En ordre FIFO estricte, una
+    preparació al capdavant esperaria una màquina retinguda per una
+    reparació que té al darrere.)
+    """
+    env = entorn()
+    recursos = ResourceSet(env, order="priority", maquina=n_maquines, operari=n_operaris)
+    params = dict(arribades=arribades, proces=proces, preparacio=preparacio,
+                  reparacio=reparacio, p_reparacio=p_reparacio)
+    stats = {"tasques": 0, "reparacions": 0,
+             "cua": TimeWeighted(env, 0), "espera": Tally()}
+
+    env.process(encarrecs(env, recursos, Streams(rng, antithetic=antitetic), params,
+                          stats, tracer))
+    env.run(until=temps)
+
+    cua = stats["cua"].report(temps)
+    ocupacio = recursos.report(temps)
+    return {
+        "cua": cua["mitjana"],
+        "cua_max": cua["max"],
+        "espera": stats["espera"].mean,
+        "ocupacio_maquines": ocupacio["ocupacio_maquina"],
+        "ocupacio_operaris": ocupacio["ocupacio_operari"],
+        "tasques": stats["tasques"],
+        "reparacions": stats["reparacions"],
+    }
+
+
+# Fàbrica de la Pràctica 9: màquines per estació i circuit de cada producte
+# (les estacions es numeren a partir d'1, com a l'enunciat; temps en hores)
+FABRICA = {
+    "estacions": [2, 1, 3, 3, 4],
+    "productes": {
+        "A": {"p": 0.5, "ruta": [4, 3, 5], "temps": [1.10, 0.80, 0.75]},
+        "B": {"p": 0.3, "ruta": [5, 3, 1, 2], "temps": [0.50, 0.60, 0.85, 0.50]},
+        "C": {"p": 0.2, "ruta": [1, 2, 3, 4, 5], "temps": [1.20, 0.25, 0.70, 0.90, 1.00]},
+    },
+    "arribades": 0.25,
+    "k": 2,
+}
+
+# Any laboral: 219 dies de 7.5 h
+ANY = 219 * 7.5
+
+
+def nou_encarrec(streams, fabrica, noms, probs):
+    """
+    Tria el producte d'un encàrrec i en genera els temps de cada tasca
+
+    Els temps es decideixen quan arriba l'encàrrec, de manera que tots els
+    motors de simulació veuen els mateixos encàrrecs. `probs` són les
+    probabilitats acumulades dels productes `noms`.
+    """
+    i = min(bisect_right(probs, streams["productes"].random()), len(noms) - 1)
+    nom = noms[i]
+    serveis = streams["serveis"]
+    k = fabrica["k"]
+    return nom, [serveis.erlang(k, t) for t in fabrica["productes"][nom]["temps"]]
+
+
+def kpis_fabrica(fabrica, espera_producte, servei, cua, ocupacio, espera_estacio):
+    """
+    Indicadors de la fàbrica amb el mateix format per a tots els motors
+
+    `espera_producte` és un diccionari producte -> (espera mitjana, encàrrecs)
+    i `servei` un diccionari (producte, estació) -> temps mitjà de la tasca;
+    `cua`, `ocupacio` i `espera_estacio` són llistes per estació.
+    """
+    out = {}
+    total = sum(n for _, n in espera_producte.values())
+    out["espera"] = (sum(m * n for m, n in espera_producte.values()) / total
+                     if total else 0.0)
+    out["encarrecs"] = total
+    for nom, (m, _) in espera_producte.items():
+        out["espera_" + nom] = m
+    for (nom, s), m in servei.items():
+        out["servei_{}_{}".format(nom, s)] = m
+    for s in range(len(fabrica["estacions"])):
+        out["cua_{}".format(s + 1)] = cua[s]
+        out["ocupacio_{}".format(s + 1)] = ocupacio[s]
+        out["espera_est_{}".format(s + 1)] = espera_estacio[s]
+    return out
+
+
+def encarrec(env, estacions, ruta, serveis, espera, servei):
+    """
+    Simula el pas d'un encàrrec per totes les estacions del seu circuit
+    """
+    total = 0.0
+    for s, temps in zip(ruta, serveis):
+        arribada = env.now
+        with estacions[s - 1].request() as req:
+            yield req
+            total += env.now - arribada
+            yield env.timeout(temps)
+        servei[s].add(temps)
+    espera.add(total)
+
+
+def comandes(env, estacions, fabrica, streams, espera, servei):
+    """
+    Simula l'arribada d'encàrrecs a la fàbrica
+    """
+    noms = list(fabrica["productes"])
+    probs = list(accumulate(fabrica["productes"][n]["p"] for n in noms))
+    arribades = streams["arribades"]
+    while True:
+        yield env.timeout(arribades.exponential(fabrica["arribades"]))
+        nom, serveis = nou_encarrec(streams, fabrica, noms, probs)
+        ruta = fabrica["productes"][nom]["ruta"]
+        env.process(encarrec(env, estacions, ruta, serveis, espera[nom],
+                             {s: servei[nom, s] for s in ruta}))
+
+
+def fabrica(rng, temps=ANY, fabrica=FABRICA, antitetic=None, entorn=simpy.Environment):
+    """
+    Fàbrica de la Pràctica 9 amb un procés de simpy per encàrrec
+    """
+    env = entorn()
+    estacions = [simpy.Resource(env, capacity=c) for c in fabrica["estacions"]]
+    monitors = [ResourceMonitor(e) for e in estacions]
+    espera = {nom: Tally() for nom in fabrica["productes"]}
+    servei = {(nom, s): Tally() for nom, p in fabrica["productes"].items()
+              for s in p["ruta"]}
+
+    env.process(comandes(env, estacions, fabrica, Streams(rng, antithetic=antitetic),
+                         espera, servei))
+    env.run(until=temps)
+
+    reports = [m.report(temps) for m in monitors]
+    return kpis_fabrica(fabrica,
+                        {nom: (t.mean, t.n) for nom, t in espera.items()},
+                        {key: t.mean for key, t in servei.items()},
+                        [r["cua_mitjana"] for r in reports],
+                        [r["ocupacio"] for r in reports],
+                        [r["espera_mitjana"] for r in reports])
@@ -0,0 +1,184 @@
+"""
+Estadístics en línia per a les simulacions d'esdeveniments discrets.
+
+Els acumuladors guarden només uns quants escalars (memòria O(1)), de manera
+que es poden fer simulacions molt llargues sense guardar cap trajectòria.
+"""
+import math
+
+
+class Tally:
+    """
+    Estadístics d'observacions discretes (per exemple temps d'espera)
+
+    Mitjana i variància amb l'algorisme de Welford.
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.max = -math.inf
+        self.min = math.inf
+
+    def add(self, x):
+        """
+        Afegeix una observació
+        """
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (x - self.mean)
+        if x > self.max:
+            self.max = x
+        if x < self.min:
+            self.min = x
+
+    @property
+    def var(self):
+        return self._m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    def report(self, prefix=""):
+        return {
+            prefix + "mitjana": self.mean,
+            prefix + "var": self.var,
+            prefix + "max": self.max if self.n else 0.0,
+            prefix + "n": self.n,
+        }
+
+
+class TimeWeighted:
+    """
+    Estadístics ponderats pel temps d'una variable d'estat (per exemple la cua)
+
+    La variable és constant entre actualitzacions. Es guarden la mitjana i la
+    variància ponderades (algorisme incremental de West), el màxim i la
+    integral del temps en què la variable és positiva.
+    """
+
+    def __init__(self, env, value=0.0):
+        self.env = env
+        self.value = value
+        self.t0 = env.now
+        self._t = env.now
+        self._w = 0.0
+        self.mean = 0.0
+        self._s = 0.0
+        self.max = value
+        self.busy = 0.0
+
+    def _accumulate(self, t):
+        w = t - self._t
+        if w > 0:
+            x = self.value
+            self._w += w
+            delta = x - self.mean
+            self.mean += w / self._w * delta
+            self._s += w * delta * (x - self.mean)
+            if x > 0:
+                self.busy += w
+            self._t = t
+
+    def update(self, value):
+        """
+        Canvia el valor de la variable a l'instant actual
+        """
+        self._accumulate(self.env.now)
+        self.value = value
+        if value > self.max:
+            self.max = value
+
+    def add(self, delta):
+        """
+        Incrementa (o decrementa) el valor de la variable
+        """
+        self.update(self.value + delta)
+
+    def _until(self, until):
+        # Tanca l'interval obert sense modificar l'estat
+        saved = (self._t, self._w, self.mean, self._s, self.busy)
+        self._accumulate(self.env.now if until is None else until)
+        result = (self._w, self.mean, self._s, self.busy)
+        self._t, self._w, self.mean, self._s, self.busy = saved
+        return result
+
+    def report(self, until=None, prefix=""):
+        """
+        Mitjana, variància, màxim i fracció de temps ocupat fins a `until`
+        """
+        w, mean, s, busy = self._until(until)
+        return {
+            prefix + "mitjana": mean,
+            prefix + "var": s / w if w > 0 else 0.0,
+            prefix + "max": self.max,
+            prefix + "ocupat": busy / w if w > 0 else 0.0,
+        }
+
+
+class ResourceMonitor:
+    """
+    Monitor d'un `simpy.Resource` o `simpy.Container`
+
+    Intercepta les peticions i els alliberaments del recurs per seguir
+    el nombre d'unitats ocupades, la llargària de la cua i el temps d'espera.
+
+        taquilla = simpy.Resource(env, capacity=2)
+        mon = ResourceMonitor(taquilla)
+        ...
+        mon.report()
+    """
+
+    def __init__(self, resource, wait=None):
+        self.resource = resource
+        env = resource._env
+        self.env = env
+        self.capacity = resource.capacity
+        if hasattr(resource, "request"):
+            acquire, release = "request", "release"
+            self._users = lambda: len(resource.users)
+            self._queue = lambda: len(resource.queue)
+        else:
+            acquire, release = "get", "put"
+            self._users = lambda: resource.capacity - resource.level
+            self._queue = lambda: len(resource.get_queue)
+        self.users = TimeWeighted(env, self._users())
+        self.queue = TimeWeighted(env, self._queue())
+        # Qualsevol objecte amb `add` (per defecte un `Tally`)
+        self.wait = Tally() if wait is None else wait
+
+        self._acquire = getattr(resource, acquire)
+        self._release = getattr(resource, release)
+        setattr(resource, acquire, self._on_acquire)
+        setattr(resource, release, self._on_release)
+
+    def _sample(self):
+        self.users.update(self._users())
+        self.queue.update(self._queue())
+
+    def _on_acquire(self, *args, **kwargs):
+        event = self._acquire(*args, **kwargs)
+        start = self.env.now
+        # L'assignació es fa quan es processa l'esdeveniment
+        event.callbacks.append(lambda _: self._granted(start))
+        self._sample()
+        return event
+
+    def _granted(self, start):
+        self.wait.add(self.env.now - start)
+        self._sample()
+
+    def _on_release(self, *args, **kwargs):
+        event = self._release(*args, **kwargs)
+        self._sample()
+        return event
+
+    def report(self, until=None):
+        """
+        Ocupació, cua i espera del recurs
+        """
+        users = self.users.report(until)
+        out = {"ocupacio": users["mitjana"] / self.capacity,
+               "ocupat": users["ocupat"]}
+        out.update(self.queue.report(until, prefix="cua_"))
+        out.update(self.wait.report(prefix="espera_"))
+        return out
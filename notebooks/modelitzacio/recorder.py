@@ -0,0 +1,166 @@
+"""
+Registre columnar de sèries temporals per a les simulacions d'esdeveniments discrets.
+
+Substitueix el patró `cua.loc[env.now] = cua.iloc[-1].pers + 1` sobre un
+DataFrame, que copia tota la taula a cada esdeveniment, per buffers de NumPy
+que creixen per duplicació (cost amortitzat O(1) per esdeveniment).
+El DataFrame només es construeix un cop, quan es demana.
+"""
+import numpy as np
+import pandas as pd
+
+
+class _Row:
+    """
+    Fila d'un registre amb accés per atribut, com `cua.iloc[-1].pers`
+    """
+    __slots__ = ("_columns", "_values")
+
+    def __init__(self, columns, values):
+        self._columns = columns
+        self._values = values
+
+    def __getattr__(self, name):
+        try:
+            return self._values[self._columns[name]]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __getitem__(self, name):
+        return self._values[self._columns[name]]
+
+
+class _Loc:
+    """
+    Assignació per temps: `cua.loc[t] = valor`
+    """
+    __slots__ = ("_rec",)
+
+    def __init__(self, rec):
+        self._rec = rec
+
+    def __setitem__(self, t, value):
+        self._rec.append(t, value)
+
+
+class _ILoc:
+    """
+    Accés per posició: `cua.iloc[-1]`
+    """
+    __slots__ = ("_rec",)
+
+    def __init__(self, rec):
+        self._rec = rec
+
+    def __getitem__(self, i):
+        rec = self._rec
+        n = rec._n
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("índex fora del registre")
+        return _Row(rec._index, rec._v[i])
+
+
+class Recorder:
+    """
+    Registre de parells (temps, valor) sobre buffers de NumPy
+
+    Es pot fer servir en lloc del DataFrame `cua` dels notebooks:
+
+        cua = Recorder(columns=['pers'])
+        cua.loc[0] = 0
+        cua.loc[env.now] = cua.iloc[-1].pers + 1
+        cua.plot()
+
+    A diferència del DataFrame, dos esdeveniments al mateix instant no se
+    sobreescriuen: es guarden tots dos, en ordre.
+    """
+
+    def __init__(self, columns=("valor",), capacity=1024):
+        if isinstance(columns, str):
+            columns = [columns]
+        self.columns = list(columns)
+        self._index = {c: i for i, c in enumerate(self.columns)}
+        capacity = max(int(capacity), 1)
+        self._t = np.empty(capacity)
+        self._v = np.empty((capacity, len(self.columns)))
+        self._n = 0
+        self._frame = None
+        self.loc = _Loc(self)
+        self.iloc = _ILoc(self)
+
+    def __len__(self):
+        return self._n
+
+    def _grow(self):
+        capacity = 2 * len(self._t)
+        t = np.empty(capacity)
+        v = np.empty((capacity, len(self.columns)))
+        t[:self._n] = self._t[:self._n]
+        v[:self._n] = self._v[:self._n]
+        self._t, self._v = t, v
+
+    def append(self, t, value):
+        """
+        Afegeix un registre a l'instant t
+        """
+        n = self._n
+        if n == len(self._t):
+            self._grow()
+        self._t[n] = t
+        self._v[n] = value
+        self._n = n + 1
+        self._frame = None
+
+    @property
+    def last(self):
+        """
+        Darrer valor de la primera columna
+        """
+        return self._v[self._n - 1, 0]
+
+    @property
+    def times(self):
+        """
+        Vista dels temps registrats
+        """
+        return self._t[:self._n]
+
+    @property
+    def values(self):
+        """
+        Vista dels valors registrats (n x columnes)
+        """
+        return self._v[:self._n]
+
+    def time_average(self, until=None, column=0):
+        """
+        Mitjana ponderada pel temps d'una columna fins a l'instant `until`
+        """
+        t = self.times
+        v = self.values[:, self._index.get(column, column)]
+        if until is None:
+            until = t[-1]
+        dt = np.diff(np.append(t, until).clip(max=until))
+        span = until - t[0]
+        return float(np.dot(v, dt) / span) if span > 0 else float(v[-1])
+
+    def to_frame(self):
+        """
+        Construeix el DataFrame indexat pel temps
+        """
+        if self._frame is None:
+            self._frame = pd.DataFrame(self.values.copy(),
+                                       index=pd.Index(self.times.copy(), name="t"),
+                                       columns=self.columns)
+        return self._frame
+
+    def __getattr__(self, name):
+        # La resta de mètodes (plot, head, describe...) són els del DataFrame
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.to_frame(), name)
+
+    def __repr__(self):
+        return "Recorder(columns={}, n={})".format(self.columns, self._n)
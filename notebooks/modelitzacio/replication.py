@@ -0,0 +1,163 @@
+"""
+Execució de rèpliques independents d'un model de simulació.
+
+Cada rèplica rep el seu propi generador, creat a partir d'un fill de
+`np.random.SeedSequence(seed)`. El fill només depèn de la llavor i de l'índex
+de la rèplica, de manera que els resultats són idèntics bit a bit sigui quin
+sigui el nombre de processos.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+def _run(args):
+    """
+    Executa una rèplica (ha de ser una funció de mòdul per poder-la enviar als processos)
+    """
+    model, seed, kwargs = args
+    return model(np.random.default_rng(seed), **kwargs)
+
+
+def replication_seeds(seed, n, start=0):
+    """
+    Llavors de les rèpliques `start` a `start + n - 1`
+
+    La llavor de la rèplica i només depèn de `seed` i de i.
+    """
+    return np.random.SeedSequence(seed).spawn(start + n)[start:]
+
+
+def run_tasks(tasks, workers=None, pool=None):
+    """
+    Executa una llista de tasques (model, llavor, paràmetres) i en retorna els resultats en ordre
+
+    Si es dona `pool`, es fa servir aquest grup de processos en lloc de
+    crear-ne un de nou.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(tasks))
+    if workers <= 1 and pool is None:
+        return [_run(t) for t in tasks]
+    # Blocs grans redueixen la comunicació entre processos
+    chunksize = max(1, len(tasks) // (4 * max(workers, 1)))
+    if pool is not None:
+        return list(pool.map(_run, tasks, chunksize=chunksize))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_run, tasks, chunksize=chunksize))
+
+
+def run_replications(model, n, seed=None, workers=None, start=0, **kwargs):
+    """
+    Executa `n` rèpliques de `model(rng, **kwargs)` i retorna una fila per rèplica
+
+    Amb `workers=1` les rèpliques s'executen al mateix procés. Amb `start`
+    es continua una sèrie de rèpliques ja començada.
+    """
+    tasks = [(model, s, kwargs) for s in replication_seeds(seed, n, start)]
+    runs = pd.DataFrame(run_tasks(tasks, workers), index=range(start, start + n))
+    runs.index.name = "replica"
+    return runs
+
+
+def summary(runs, alpha=0.05):
+    """
+    Taula resum amb la mitjana i l'interval de confiança t de cada indicador
+    """
+    n = len(runs)
+    mean = runs.mean()
+    std = runs.std(ddof=1) if n > 1 else runs.std(ddof=0) * np.nan
+    half = stats.t.ppf(1 - alpha / 2, n - 1) * std / np.sqrt(n)
+    return pd.DataFrame({
+        "mitjana": mean,
+        "std": std,
+        "semiamplada": half,
+        "ic_inf": mean - half,
+        "ic_sup": mean + half,
+        "n": n,
+    })
+
+
+def replicate(model, n, seed=None, workers=None, alpha=0.05, **kwargs):
+    """
+    Executa les rèpliques i retorna el resum amb intervals de confiança i les rèpliques
+    """
+    runs = run_replications(model, n, seed=seed, workers=workers, **kwargs)
+    return summary(runs, alpha), runs
+
+
+def replicate_until(model, kpis, precision=0.05, absolute=None, n0=10, max_reps=1000,
+                    max_time=None, seed=None, workers=None, alpha=0.05, **kwargs):
+    """
+    Executa rèpliques per lots fins que els intervals de confiança són prou estrets
+
+    `kpis` són els indicadors que s'han d'estimar. L'objectiu és una
+    semiamplada relativa `precision` (semiamplada / |mitjana|) o, si es
+    dona, una semiamplada absoluta `absolute` (un valor per a tots o un
+    diccionari indicador -> valor). Després de les `n0` primeres rèpliques,
+    cada lot té les rèpliques que l'interval actual diu que falten (com a
+    mínim una per procés), fins a `max_reps` rèpliques o `max_time` segons.
+    Cal que 2 <= `n0` <= `max_reps`.
+
+    Retorna el resum de tots els indicadors, amb les columnes `objectiu` i
+    `assolit` per als demanats, i les rèpliques. Les rèpliques són les
+    mateixes que les de `run_replications` amb la mateixa llavor.
+    """
+    if n0 < 2:
+        raise ValueError("calen com a mínim dues rèpliques inicials (n0 >= 2)")
+    if max_reps < n0:
+        raise ValueError("max_reps ha de ser com a mínim n0")
+    if isinstance(kpis, str):
+        kpis = [kpis]
+    if seed is None:
+        # Cal una llavor fixa perquè els lots continuïn la mateixa sèrie
+        seed = np.random.SeedSequence().entropy
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if absolute is not None and not isinstance(absolute, dict):
+        absolute = {k: absolute for k in kpis}
+    t0 = time.perf_counter()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    results = []
+    n_next = n0
+    try:
+        while n_next > 0:
+            n = len(results)
+            tasks = [(model, s, kwargs) for s in replication_seeds(seed, n_next, n)]
+            results.extend(run_tasks(tasks, workers, pool))
+            n = len(results)
+            runs = pd.DataFrame(results)
+            res = summary(runs, alpha)
+            half = res.loc[kpis, "semiamplada"]
+            if absolute is not None:
+                target = pd.Series([absolute.get(k, np.nan) for k in kpis], index=kpis)
+                target = target.fillna(precision * res.loc[kpis, "mitjana"].abs())
+            else:
+                target = precision * res.loc[kpis, "mitjana"].abs()
+            done = half <= target
+            if done.all() or n >= max_reps:
+                break
+            elapsed = time.perf_counter() - t0
+            if max_time is not None and elapsed >= max_time:
+                break
+            # Rèpliques necessàries: la semiamplada decreix com 1 / sqrt(n).
+            # Cada lot com a molt duplica les rèpliques, perquè les primeres
+            # estimacions de la variància són poc fiables
+            ratio = (half[~done] / target[~done]).replace(np.inf, np.nan).max()
+            needed = n * ratio ** 2 if np.isfinite(ratio) else 2 * n
+            n_next = min(np.ceil(needed) - n, n, max_reps - n)
+            if max_time is not None:
+                n_next = min(n_next, (max_time - elapsed) * n / elapsed)
+            n_next = int(min(max(n_next, workers, 1), max_reps - n))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    runs.index.name = "replica"
+    res["objectiu"] = target
+    res["assolit"] = done
+    return res, runs
@@ -0,0 +1,191 @@
+"""
+Peticions atòmiques sobre diversos recursos alhora.
+
+Amb peticions de simpy imbricades (primer la màquina, després l'operari)
+un procés pot quedar-se amb una unitat mentre n'espera una altra, i això
+bloqueja el taller o deixa operaris aturats. `ResourceSet` concedeix totes
+les unitats d'una petició de cop o cap.
+
+Les peticions en espera s'agrupen per la forma de la demanda (quantes
+unitats de cada recurs). Quan s'alliberen unitats només es consulta el
+primer de cada grup, sense recórrer tota la cua.
+"""
+from heapq import heappop, heappush
+from itertools import count
+
+import simpy
+
+from .monitor import Tally, TimeWeighted
+
+
+class Acquire(simpy.Event):
+    """
+    Petició d'unitats d'un `ResourceSet`
+
+    Es pot fer servir com la petició d'un `simpy.Resource`:
+
+        with recursos.acquire(maquina=1, operari=1) as req:
+            yield req
+            ...
+    """
+
+    def __init__(self, resources, demand, priority):
+        super().__init__(resources.env)
+        self.resources = resources
+        self.demand = demand
+        self.priority = priority
+        self.time = resources.env.now
+        self.held = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.held is None:
+            self.resources.cancel(self)
+        elif any(self.held):
+            self.resources.release(self)
+
+
+class ResourceSet:
+    """
+    Conjunt de recursos amb peticions atòmiques de diverses unitats
+
+        recursos = ResourceSet(env, maquina=5, operari=3)
+        req = recursos.acquire(maquina=1, operari=1)
+        yield req
+        recursos.release(req, operari=1)   # allibera només l'operari
+
+    Amb `order="fifo"` les peticions es concedeixen estrictament per ordre
+    d'arribada: si la més antiga no hi cap, les posteriors també esperen,
+    encara que hi càpiguen, i una petició gran no queda mai endarrerida per
+    un flux de petites. Amb `order="priority"` l'ordre és per prioritat
+    (menor primer) i després per arribada, també estricte. Amb
+    `order="first-fit"` es concedeix la més antiga de les que hi caben
+    (per prioritat si se'n donen): una petició que no hi cap no bloqueja
+    les posteriors, però pot esperar indefinidament.
+
+    Amb l'ordre estricte cal vigilar els bloquejos: una petició que espera
+    al capdavant un recurs que reté una petició posterior no es concedirà
+    mai.
+    """
+
+    def __init__(self, env, order="fifo", **pools):
+        if order not in ("fifo", "first-fit", "priority"):
+            raise ValueError("order ha de ser 'fifo', 'first-fit' o 'priority'")
+        self.env = env
+        self.order = order
+        self.names = list(pools)
+        self.capacity = tuple(pools.values())
+        self.free = list(self.capacity)
+        self._groups = {}
+        self._seq = count()
+        self._pending = 0
+        self.in_use = {n: TimeWeighted(env, 0) for n in self.names}
+        self.waiting = TimeWeighted(env, 0)
+        self.wait = Tally()
+
+    def _key(self, amounts):
+        unknown = set(amounts) - set(self.names)
+        if unknown:
+            raise KeyError("recursos desconeguts: {}".format(sorted(unknown)))
+        return tuple(amounts.get(n, 0) for n in self.names)
+
+    def _fits(self, key):
+        return all(k <= f for k, f in zip(key, self.free))
+
+    def acquire(self, priority=0, **amounts):
+        """
+        Demana unitats de diversos recursos alhora
+        """
+        key = self._key(amounts)
+        if any(k > c for k, c in zip(key, self.capacity)):
+            raise ValueError("la petició supera la capacitat dels recursos")
+        req = Acquire(self, key, priority)
+        prio = priority if self.order != "fifo" else 0
+        # En ordre estricte no es pot passar davant d'una petició més prioritària o més antiga
+        if self._fits(key) and not (self.order != "first-fit" and self._blocked(prio)):
+            self._grant(req)
+        else:
+            heappush(self._groups.setdefault(key, []), (prio, next(self._seq), req))
+            self.waiting.add(1)
+            self._pending += 1
+        return req
+
+    def _blocked(self, prio):
+        """
+        Cert si hi ha alguna petició en espera amb prioritat igual o més alta que `prio`
+        """
+        if not self._pending:
+            return False
+        for heap in self._groups.values():
+            while heap and heap[0][2].held == ():
+                heappop(heap)
+            if heap and heap[0][0] <= prio:
+                return True
+        return False
+
+    def _grant(self, req):
+        for i, k in enumerate(req.demand):
+            if k:
+                self.free[i] -= k
+                self.in_use[self.names[i]].add(k)
+        req.held = list(req.demand)
+        self.wait.add(self.env.now - req.time)
+        req.succeed()
+
+    def release(self, req, **amounts):
+        """
+        Allibera les unitats de la petició (o només les indicades)
+        """
+        key = self._key(amounts) if amounts else tuple(req.held)
+        for i, k in enumerate(key):
+            if k > req.held[i]:
+                raise ValueError("no es poden alliberar més unitats de les concedides")
+            if k:
+                req.held[i] -= k
+                self.free[i] += k
+                self.in_use[self.names[i]].add(-k)
+        self._dispatch()
+
+    def cancel(self, req):
+        """
+        Retira una petició que encara no s'ha concedit
+        """
+        # S'esborra del grup quan arriba al capdavant
+        if not req.triggered:
+            req.held = ()
+            self.waiting.add(-1)
+            self._pending -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """
+        Concedeix les peticions en espera que ara hi caben
+        """
+        strict = self.order != "first-fit"
+        while True:
+            best = None
+            for key, heap in self._groups.items():
+                while heap and heap[0][2].held == ():
+                    heappop(heap)
+                if heap and (strict or self._fits(key)) and (best is None or heap[0] < best[0]):
+                    best = (heap[0], heap, key)
+            # En ordre estricte, la primera que no hi cap atura les altres
+            if best is None or not self._fits(best[2]):
+                return
+            heappop(best[1])
+            self.waiting.add(-1)
+            self._pending -= 1
+            self._grant(best[0][2])
+
+    def report(self, until=None):
+        """
+        Ocupació de cada recurs, peticions en espera i temps d'espera
+        """
+        out = {}
+        for name, cap in zip(self.names, self.capacity):
+            out["ocupacio_" + name] = self.in_use[name].report(until)["mitjana"] / cap
+        out.update(self.waiting.report(until, prefix="cua_"))
+        out.update(self.wait.report(prefix="espera_"))
+        return out
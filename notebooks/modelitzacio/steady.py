@@ -0,0 +1,160 @@
+"""
+Estimació de l'estat estacionari d'una simulació.
+
+La simulació comença amb la cua buida, i les primeres observacions no són
+representatives del règim estacionari. Aquí:
+
+- `mser` troba el període d'escalfament que cal descartar (MSER-5),
+- `batch_means` calcula l'interval de confiança amb mitjanes per lots,
+- `run_until_precision` avança la simulació fins que tots els indicadors
+  tenen la precisió relativa demanada.
+"""
+import numpy as np
+from scipy import stats
+
+
+class BatchSeries:
+    """
+    Sèrie d'observacions (per exemple temps d'espera) guardada en lots de `batch`
+
+    Es guarden només les mitjanes dels lots; amb `batch=5` la sèrie ja és la
+    que fa servir MSER-5.
+    """
+
+    def __init__(self, batch=5):
+        self.batch = batch
+        self._sum = 0.0
+        self._n = 0
+        self._means = []
+
+    def add(self, x):
+        self._sum += x
+        self._n += 1
+        if self._n == self.batch:
+            self._means.append(self._sum / self.batch)
+            self._sum = 0.0
+            self._n = 0
+
+    def values(self):
+        return np.array(self._means)
+
+
+class BinnedSeries:
+    """
+    Variable d'estat (per exemple la cua) resumida en mitjanes per intervals de temps
+
+    Té la mateixa interfície que `TimeWeighted` (`update` i `add`) i guarda
+    la mitjana ponderada pel temps de cada interval de durada `width`.
+    """
+
+    def __init__(self, env, width, value=0.0):
+        self.env = env
+        self.width = width
+        self.value = value
+        self._t = env.now
+        self._end = env.now + width
+        self._area = 0.0
+        self._means = []
+
+    def _advance(self, t):
+        while t >= self._end:
+            self._area += self.value * (self._end - self._t)
+            self._means.append(self._area / self.width)
+            self._area = 0.0
+            self._t = self._end
+            self._end += self.width
+        self._area += self.value * (t - self._t)
+        self._t = t
+
+    def update(self, value):
+        self._advance(self.env.now)
+        self.value = value
+
+    def add(self, delta):
+        self.update(self.value + delta)
+
+    def values(self):
+        self._advance(self.env.now)
+        return np.array(self._means)
+
+
+def mser(x, batch=5):
+    """
+    Nombre d'observacions a descartar a l'inici de la sèrie (regla MSER)
+
+    Es calculen les mitjanes de lots de `batch` observacions i es tria el
+    truncament d que minimitza var(x[d:]) / (n - d), buscant-lo només a la
+    primera meitat de la sèrie. Retorna d i si s'ha detectat l'escalfament:
+    si el mínim cau al final d'aquesta meitat (o hi ha menys de dos lots),
+    la sèrie és massa curta per detectar-lo i d no és fiable.
+    """
+    x = np.asarray(x, dtype=float)
+    m = len(x) // batch
+    if m < 2:
+        return 0, False
+    y = x[:m * batch].reshape(m, batch).mean(axis=1)
+    # Sumes des del final per avaluar tots els truncaments de cop
+    s1 = np.cumsum(y[::-1])[::-1]
+    s2 = np.cumsum((y ** 2)[::-1])[::-1]
+    n = m - np.arange(m)
+    var = s2 / n - (s1 / n) ** 2
+    mser = var / n
+    d = int(np.argmin(mser[:m // 2 + 1]))
+    return d * batch, d < m // 2
+
+
+def batch_means(x, n_batches=20, alpha=0.05):
+    """
+    Mitjana i semiamplada de l'interval de confiança per mitjanes de lots
+
+    Les observacions que sobren es treuen de l'inici de la sèrie.
+    """
+    x = np.asarray(x, dtype=float)
+    size = len(x) // n_batches
+    if size < 1:
+        return float(np.mean(x)) if len(x) else np.nan, np.inf
+    y = x[len(x) - size * n_batches:].reshape(n_batches, size).mean(axis=1)
+    half = stats.t.ppf(1 - alpha / 2, n_batches - 1) * y.std(ddof=1) / np.sqrt(n_batches)
+    return float(y.mean()), float(half)
+
+
+def steady_state(series, n_batches=20, alpha=0.05, batch=1):
+    """
+    Escalfament, mitjana i semiamplada de cada sèrie d'un diccionari
+
+    `detectat` és fals si la sèrie és massa curta per detectar l'escalfament.
+    """
+    out = {}
+    for name, s in series.items():
+        x = s.values()
+        d, detected = mser(x, batch)
+        mean, half = batch_means(x[d:], n_batches, alpha)
+        out[name] = {"escalfament": d, "detectat": detected, "mitjana": mean,
+                     "semiamplada": half, "n": len(x) - d}
+    return out
+
+
+def run_until_precision(env, series, precision=0.05, interval=1000, until=None,
+                        n_batches=20, alpha=0.05, min_batch=5, growth=0.25):
+    """
+    Avança la simulació per intervals fins que totes les sèries són prou precises
+
+    Després de cada interval de temps simulat es detecta l'escalfament amb
+    MSER sobre cada sèrie i es calcula l'interval de confiança per mitjanes
+    de lots. La simulació s'atura quan s'ha detectat l'escalfament de totes
+    les sèries i la seva semiamplada relativa és menor que `precision` (amb
+    almenys `min_batch` observacions per lot), o quan s'arriba a `until`.
+    Els intervals comencen amb `interval` i creixen amb el temps simulat
+    (`growth`), perquè el cost de les comprovacions no creixi quadràticament.
+    """
+    while True:
+        t = env.now + max(interval, growth * env.now)
+        if until is not None:
+            t = min(t, until)
+        env.run(until=t)
+        est = steady_state(series, n_batches, alpha)
+        done = all(e["detectat"] and e["n"] >= n_batches * min_batch
+                   and e["semiamplada"] <= precision * abs(e["mitjana"])
+                   for e in est.values())
+        if done or (until is not None and env.now >= until):
+            return {"temps": env.now, "precisio": done, "estimacions": est}
@@ -0,0 +1,161 @@
+"""
+Exploració de configuracions i selecció de la millor.
+
+`grid` genera totes les combinacions de capacitats (màquines, operaris,
+taquilles...). `sweep` les simula totes amb el mateix nombre de rèpliques,
+i `kim_nelson` aplica el procediment seqüencial de Kim i Nelson, que
+elimina les configuracions clarament pitjors a mesura que s'acumulen
+rèpliques i només continua simulant les que encara poden ser la millor.
+
+Totes les configuracions fan servir les mateixes llavors per rèplica
+(nombres aleatoris comuns), i les rèpliques s'executen en un grup de
+processos compartit.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+import os
+
+import numpy as np
+import pandas as pd
+
+from .replication import replication_seeds, run_tasks, summary
+
+
+def grid(**axes):
+    """
+    Totes les combinacions dels valors de cada paràmetre
+
+        grid(n_maquines=[5, 6], n_operaris=[3, 4])
+
+    Retorna un diccionari nom -> paràmetres del model.
+    """
+    names = list(axes)
+    configs = {}
+    for values in product(*axes.values()):
+        kw = dict(zip(names, values))
+        configs[", ".join("{}={}".format(k, v) for k, v in kw.items())] = kw
+    return configs
+
+
+def _pool(workers):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return (ProcessPoolExecutor(max_workers=workers) if workers > 1 else None), workers
+
+
+def _replicate(model, configs, names, start, n, seed, fixed, pool, workers):
+    """
+    Rèpliques `start` a `start + n - 1` de les configuracions `names`
+    """
+    seeds = replication_seeds(seed, n, start)
+    tasks = [(model, s, {**fixed, **configs[name]}) for name in names for s in seeds]
+    results = run_tasks(tasks, workers, pool)
+    return {name: results[i * n:(i + 1) * n] for i, name in enumerate(names)}
+
+
+def sweep(model, configs, n, seed=None, workers=None, alpha=0.05, **fixed):
+    """
+    Simula `n` rèpliques de totes les configuracions (disseny factorial complet)
+
+    Retorna el resum de cada indicador per configuració.
+    """
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    pool, workers = _pool(workers)
+    try:
+        runs = _replicate(model, configs, list(configs), 0, n, seed, fixed, pool, workers)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return pd.concat({name: summary(pd.DataFrame(r), alpha) for name, r in runs.items()},
+                     names=["configuracio", "kpi"])
+
+
+def kim_nelson(model, configs, kpi, delta, minimize=True, n0=10, alpha=0.05,
+               seed=None, workers=None, max_reps=1000, step=None, **fixed):
+    """
+    Selecció de la millor configuració amb el procediment KN (Kim i Nelson, 2001)
+
+    `kpi` és l'indicador del model que es vol minimitzar (o maximitzar), o
+    una funció `kpi(resultats, parametres)` (per exemple un cost que sumi la
+    cua i el personal), i `delta` la zona d'indiferència: la diferència més
+    petita que importa.
+    Amb probabilitat 1 - alpha la configuració triada és la millor o està a
+    menys de `delta` de la millor.
+
+    Després de `n0` rèpliques inicials, a cada etapa es fa una rèplica més
+    de les configuracions que queden i s'eliminen les que queden per sota
+    d'alguna altra més d'un marge W que decreix amb les rèpliques. Per
+    aprofitar els processos es fan `step` rèpliques per etapa. Cal que
+    `n0` >= 2.
+    """
+    if n0 < 2:
+        raise ValueError("calen com a mínim dues rèpliques inicials (n0 >= 2)")
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    names = list(configs)
+    k = len(names)
+    sign = 1.0 if minimize else -1.0
+    eta = 0.5 * ((2 * alpha / max(k - 1, 1)) ** (-2 / (n0 - 1)) - 1)
+    h2 = 2 * eta * (n0 - 1)
+
+    if callable(kpi):
+        value = kpi
+    else:
+        def value(res, params):
+            return res[kpi]
+
+    pool, workers = _pool(workers)
+    data = {name: [] for name in names}
+    alive = list(range(k))
+    eliminated = {}
+    try:
+        first = _replicate(model, configs, names, 0, n0, seed, fixed, pool, workers)
+        for name in names:
+            data[name] = [sign * value(r, configs[name]) for r in first[name]]
+        x = np.array([data[name] for name in names])
+        # Variància de les diferències aparellades amb les n0 primeres rèpliques
+        s2 = np.array([[np.var(x[i] - x[l], ddof=1) for l in range(k)] for i in range(k)])
+
+        r = n0
+        while len(alive) > 1 and r < max_reps:
+            if step is None:
+                n_step = max(1, -(-workers // len(alive)))
+            else:
+                n_step = step
+            n_step = min(n_step, max_reps - r)
+            new = _replicate(model, configs, [names[i] for i in alive], r, n_step,
+                             seed, fixed, pool, workers)
+            for i in alive:
+                data[names[i]].extend(sign * value(res, configs[names[i]])
+                                      for res in new[names[i]])
+            # Les eliminacions es comproven rèplica a rèplica
+            for rr in range(r + 1, r + n_step + 1):
+                idx = np.array(alive)
+                means = np.array([np.mean(data[names[i]][:rr]) for i in alive])
+                w = np.maximum(0.0, delta / (2 * rr) * (h2 * s2[np.ix_(idx, idx)] / delta ** 2 - rr))
+                # i queda eliminat si és pitjor que algun l més enllà del marge W
+                worse = means[:, None] > means[None, :] + w
+                np.fill_diagonal(worse, False)
+                keep = ~worse.any(axis=1)
+                for i in idx[~keep]:
+                    eliminated[names[i]] = rr
+                alive = [i for i, kp in zip(alive, keep) if kp]
+                if len(alive) == 1:
+                    break
+            r += n_step
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    means = pd.Series({name: sign * np.mean(v) for name, v in data.items()})
+    reps = pd.Series({name: len(v) for name, v in data.items()})
+    best = min(alive, key=lambda i: sign * means[names[i]])
+    return {
+        "millor": names[best],
+        "candidats": [names[i] for i in alive],
+        "eliminades": eliminated,
+        "mitjanes": means,
+        "repliques": reps,
+        "total": int(reps.sum()),
+    }
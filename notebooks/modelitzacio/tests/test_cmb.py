@@ -0,0 +1,8 @@
+from modelitzacio import cmb
+
+
+def test_groups_follow_routes():
+    assert cmb._groups(cmb.FABRICA, 1) == [[1, 2, 3, 4, 5]]
+    assert cmb._groups(cmb.FABRICA, 2) == [[1, 2], [3, 4, 5]]
+    assert cmb._groups(cmb.FABRICA, 3) == [[1, 2], [3, 5], [4]]
+    assert cmb._groups(cmb.FABRICA, 9) == [[1], [2], [3], [4], [5]]
@@ -0,0 +1,23 @@
+import numpy as np
+
+from modelitzacio import edo
+
+
+def test_double_root_is_semistable():
+    res = edo.equilibria("y**2")
+    assert np.allclose(res["equilibris"], [[0.0]])
+    assert res["estabilitat"].tolist() == [["semiestable"]]
+    assert res["inflexio"].size == 0
+
+
+def test_fold():
+    res = edo.equilibria("y**2 - h", {"h": np.linspace(-1, 1, 2001)})
+    n = np.sum(~np.isnan(res["equilibris"]), axis=1)
+    assert (n[:1000] == 0).all() and n[1000] == 1 and (n[1001:] == 2).all()
+    assert res["estabilitat"][1000, 0] == "semiestable"
+    assert res["estabilitat"][-1].tolist() == ["estable", "inestable"]
+
+
+def test_zero_slope_has_no_equilibria():
+    res = edo.equilibria("r*y*(1 - y)", {"r": [0.0]})
+    assert res["equilibris"].size == 0
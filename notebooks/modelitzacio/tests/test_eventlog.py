@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from modelitzacio import models
+from modelitzacio.eventlog import EventLog, apply, counts, open_log, run_logged
+
+
+@pytest.mark.parametrize("ext", [".npy", ".parquet"])
+def test_round_trip(tmp_path, ext):
+    if ext == ".parquet":
+        pytest.importorskip("pyarrow")
+    path = str(tmp_path / ("log" + ext))
+    with EventLog(path, size=3) as log:
+        for i in range(10):
+            log.debug(float(i), "arribada" if i % 2 else "venda", i)
+    records, names = open_log(path)
+    assert names == ["venda", "arribada"]
+    assert len(records) == 10
+    assert np.array_equal(records["t"], np.arange(10.0))
+    assert counts(records, names).to_dict() == {"venda": 5, "arribada": 5}
+
+
+def test_configurations_do_not_overwrite(tmp_path):
+    directory = str(tmp_path)
+    runs = {c: run_logged(models.taquilles, 3, directory, seed=1, workers=1,
+                          n_taquilles=c, temps=200)
+            for c in (2, 3)}
+    for c, r in runs.items():
+        clients = apply(directory, lambda rec, names: {"clients": counts(rec, names)["venda"]},
+                        n_taquilles=c, temps=200)
+        assert list(clients.index) == [0, 1, 2]
+        assert np.array_equal(clients["clients"], r["clients"])
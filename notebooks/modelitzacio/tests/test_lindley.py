@@ -0,0 +1,21 @@
+"""
+Les recurrències de Lindley i Kiefer-Wolfowitz donen els mateixos
+indicadors que el model de simpy amb les mateixes traces
+"""
+import numpy as np
+import pytest
+
+from modelitzacio import lindley, models
+
+
+@pytest.mark.parametrize("c", [1, 2, 3])
+def test_fifo_kpis_matches_simpy(c):
+    rng = np.random.default_rng(c)
+    temps = 2000
+    entre_arribades = rng.exponential(8, 400)
+    serveis = rng.exponential(10, 400)
+    sim = models.taquilles(rng, n_taquilles=c, temps=temps,
+                           entre_arribades=entre_arribades, serveis=serveis)
+    vec = lindley.fifo_kpis(entre_arribades, serveis, c, temps).iloc[0]
+    for kpi in ("cua", "cua_max", "espera", "ocupacio", "clients"):
+        assert np.allclose(vec[kpi], sim[kpi]), kpi
@@ -0,0 +1,15 @@
+import pytest
+
+from modelitzacio import models, replicate_until
+
+
+@pytest.mark.parametrize("n0, max_reps", [(0, 10), (1, 10), (10, 0), (10, 5)])
+def test_replicate_until_checks_arguments(n0, max_reps):
+    with pytest.raises(ValueError):
+        replicate_until(models.taquilles, "cua", n0=n0, max_reps=max_reps, workers=1)
+
+
+def test_replicate_until_stops_at_max_reps():
+    res, runs = replicate_until(models.taquilles, "cua", precision=1e-6, n0=2, max_reps=5,
+                                seed=1, workers=1)
+    assert len(runs) == 5 and not res.loc["cua", "assolit"]
@@ -0,0 +1,14 @@
+import numpy as np
+
+from modelitzacio import mser
+
+
+def test_mser_detects_warm_up():
+    x = np.r_[np.linspace(50, 0, 400), np.random.default_rng(0).normal(0, 1, 2000)]
+    d, detected = mser(x)
+    assert detected and 350 <= d <= 450
+
+
+def test_mser_reports_short_series():
+    assert mser(np.linspace(50, 0, 400)) == (200, False)
+    assert mser([1.0, 2.0, 3.0]) == (0, False)
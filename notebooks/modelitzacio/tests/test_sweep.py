@@ -0,0 +1,10 @@
+import pytest
+
+from modelitzacio import kim_nelson, models
+
+
+@pytest.mark.parametrize("n0", [0, 1])
+def test_kim_nelson_checks_n0(n0):
+    configs = {"2": dict(n_taquilles=2), "3": dict(n_taquilles=3)}
+    with pytest.raises(ValueError):
+        kim_nelson(models.taquilles, configs, "espera", delta=1, n0=n0, workers=1)
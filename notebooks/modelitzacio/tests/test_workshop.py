@@ -0,0 +1,27 @@
+"""
+El motor propi del taller dona els mateixos indicadors que el model de simpy
+i es pot continuar des d'un punt de control
+"""
+import numpy as np
+import pytest
+
+from modelitzacio import checkpoint, models, workshop
+
+
+@pytest.mark.parametrize("kwargs", [{}, dict(arribades=20), dict(arribades=9, n_operaris=4)])
+def test_taller_matches_simpy(kwargs):
+    for seed in range(3):
+        sim = models.taller(np.random.default_rng(seed), **kwargs)
+        own = workshop.taller(np.random.default_rng(seed), **kwargs)
+        for kpi in sim:
+            assert np.isclose(sim[kpi], own[kpi]), kpi
+
+
+def test_resume_is_identical(tmp_path):
+    temps = 7 * 24 * 60
+    ref = workshop.Workshop(rng=np.random.default_rng(3))
+    ref.run(temps)
+    shop = workshop.Workshop(rng=np.random.default_rng(3))
+    checkpoint.run_with_checkpoints(shop, temps / 2, every=1000, directory=str(tmp_path))
+    shop = checkpoint.resume(checkpoint.latest(str(tmp_path)), temps)
+    assert shop.report() == ref.report()
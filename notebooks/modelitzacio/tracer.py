@@ -0,0 +1,131 @@
+"""
+Traça d'esdeveniments per substituir els `print` dins dels processos.
+
+Un `Tracer` guarda els darrers `size` esdeveniments en un buffer circular
+de mida fixa i els pot bolcar a un fitxer `.npz` quan es demana. Els nivells
+per sota del llindar són objectes buits que avaluen a fals, de manera que
+
+    if tracer.info:
+        tracer.info(env.now, "arribada", client)
+
+no fa res més que una consulta d'atribut quan la traça està desactivada.
+"""
+import numpy as np
+import pandas as pd
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+OFF = 100
+
+_LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING}
+
+RECORD = np.dtype([("t", "f8"), ("nivell", "i1"), ("esdeveniment", "i2"),
+                   ("entitat", "i8"), ("valor", "f8")])
+
+
+class _Off:
+    """
+    Nivell desactivat: no fa res i avalua a fals
+    """
+    __slots__ = ()
+
+    def __bool__(self):
+        return False
+
+    def __call__(self, *args):
+        pass
+
+
+_OFF = _Off()
+
+
+class Tracer:
+    """
+    Traça d'esdeveniments amb nivells i buffer circular
+
+    Cada registre és (temps, nivell, esdeveniment, entitat, valor). Els noms
+    dels esdeveniments es guarden un sol cop i els registres en porten
+    el codi. Amb `echo=True` també s'escriuen per pantalla, com els `print`
+    dels notebooks.
+    """
+
+    def __init__(self, level=INFO, size=10000, echo=False):
+        self.size = size
+        self.echo = echo
+        self.names = []
+        self._codes = {}
+        self._buf = [None] * size
+        self._n = 0
+        self.set_level(level)
+
+    def set_level(self, level):
+        """
+        Canvia el llindar de nivell (DEBUG, INFO, WARNING o OFF)
+        """
+        self.level = level
+        for name, value in _LEVELS.items():
+            if value >= level:
+                setattr(self, name, self._recorder(value))
+            else:
+                setattr(self, name, _OFF)
+
+    def _code(self, name):
+        code = self._codes.get(name)
+        if code is None:
+            code = self._codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    def _recorder(self, level):
+        def record(t, event, entity=-1, value=np.nan):
+            self._buf[self._n % self.size] = (t, level, self._code(event), entity, value)
+            self._n += 1
+            if self.echo:
+                print(t, event, entity, *([] if value != value else [value]))
+        return record
+
+    def __len__(self):
+        return min(self._n, self.size)
+
+    def records(self):
+        """
+        Registres del buffer, del més antic al més recent
+        """
+        n, size = self._n, self.size
+        if n <= size:
+            rows = self._buf[:n]
+        else:
+            i = n % size
+            rows = self._buf[i:] + self._buf[:i]
+        return np.array(rows, dtype=RECORD)
+
+    def dump(self, path):
+        """
+        Bolca el buffer a un fitxer `.npz` comprimit
+        """
+        np.savez_compressed(path, records=self.records(), names=np.array(self.names),
+                            total=self._n)
+
+    def to_frame(self):
+        """
+        Registres del buffer com a DataFrame
+        """
+        return _frame(self.records(), self.names)
+
+
+def _frame(records, names):
+    df = pd.DataFrame(records)
+    df["esdeveniment"] = pd.Categorical.from_codes(df["esdeveniment"], categories=list(names))
+    return df
+
+
+def load(path):
+    """
+    Llegeix un fitxer bolcat amb `Tracer.dump`
+    """
+    with np.load(path) as data:
+        return _frame(data["records"], data["names"])
+
+
+NULL = Tracer(level=OFF, size=1)
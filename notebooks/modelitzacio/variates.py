@@ -0,0 +1,188 @@
+"""
+Fluxos de nombres aleatoris amb memòria intermèdia.
+
+Demanar a NumPy un sol nombre aleatori cada cop (`rng.exponential(10)`)
+costa molt més que generar-ne milers de cop. `VariateStream` en genera
+blocs grans i els lliura d'un en un.
+
+`Streams` dona un flux independent per a cada font d'aleatorietat
+(arribades, serveis...), identificat pel nom. Així afegir una nova font o
+canviar l'ordre de les crides al model no altera els nombres de les altres.
+
+Amb `antithetic=False` o `True` les variables es generen per inversió a
+partir de nombres uniformes U; en el mode antitètic es fa servir 1 - U.
+Dues rèpliques amb la mateixa llavor, una de cada mode, formen una parella
+antitètica.
+"""
+import zlib
+
+import numpy as np
+from scipy import special
+
+# Evita U = 0 o U = 1 en les inversions
+_EPS = np.finfo(float).eps
+
+
+def _seed_sequence(seed):
+    """
+    Obté la `SeedSequence` d'una llavor, d'una `SeedSequence` o d'un `Generator`
+
+    D'un `Generator` se'n treuen nombres, de manera que el generador avança
+    i dues crides seguides amb el mateix generador donen fluxos diferents.
+    """
+    if isinstance(seed, np.random.Generator):
+        return np.random.SeedSequence(seed.integers(2**32, size=4))
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    return np.random.SeedSequence(seed)
+
+
+class VariateStream:
+    """
+    Flux de variables aleatòries generades per blocs amb un `Generator` propi
+
+        s = VariateStream(seed)
+        s.exponential(10)
+
+    Amb `antithetic=None` (per defecte) es fan servir els generadors propis
+    de NumPy, que són els més ràpids.
+    """
+
+    def __init__(self, seed=None, block=4096, antithetic=None):
+        if isinstance(seed, np.random.Generator):
+            self.rng = seed
+        else:
+            self.rng = np.random.default_rng(seed)
+        self.block = block
+        self.antithetic = antithetic
+        self._exp = iter(())
+        self._norm = iter(())
+        self._unif = iter(())
+        self._gamma = {}
+
+    def _uniforms(self):
+        u = self.rng.random(self.block)
+        if self.antithetic:
+            u = 1.0 - u
+        return np.clip(u, _EPS, 1.0 - _EPS)
+
+    def _refill(self, kind):
+        rng = self.rng
+        if self.antithetic is not None:
+            u = self._uniforms()
+            if kind == "exp":
+                self._exp = iter((-np.log1p(-u)).tolist())
+                return self._exp
+            if kind == "norm":
+                self._norm = iter(special.ndtri(u).tolist())
+                return self._norm
+            self._unif = iter(u.tolist())
+            return self._unif
+        if kind == "exp":
+            self._exp = iter(rng.standard_exponential(self.block).tolist())
+            return self._exp
+        if kind == "norm":
+            self._norm = iter(rng.standard_normal(self.block).tolist())
+            return self._norm
+        self._unif = iter(rng.random(self.block).tolist())
+        return self._unif
+
+    def exponential(self, scale=1.0):
+        """
+        Exponencial de mitjana `scale`
+        """
+        try:
+            return scale * next(self._exp)
+        except StopIteration:
+            return scale * next(self._refill("exp"))
+
+    def normal(self, loc=0.0, scale=1.0):
+        """
+        Normal de mitjana `loc` i desviació `scale`
+        """
+        try:
+            return loc + scale * next(self._norm)
+        except StopIteration:
+            return loc + scale * next(self._refill("norm"))
+
+    def random(self):
+        """
+        Uniforme a [0, 1)
+        """
+        try:
+            return next(self._unif)
+        except StopIteration:
+            return next(self._refill("unif"))
+
+    def uniform(self, low=0.0, high=1.0):
+        """
+        Uniforme a [low, high)
+        """
+        return low + (high - low) * self.random()
+
+    def empirical(self, data):
+        """
+        Un valor de `data` triat a l'atzar (distribució empírica)
+        """
+        return data[int(self.random() * len(data))]
+
+    def erlang(self, k, mean):
+        """
+        Erlang amb `k` fases i mitjana `mean`
+        """
+        return self.gamma(k, mean / k)
+
+    def gamma(self, shape, scale=1.0):
+        """
+        Gamma amb forma `shape` i escala `scale` (un buffer per forma)
+        """
+        try:
+            return scale * next(self._gamma[shape])
+        except (KeyError, StopIteration):
+            if self.antithetic is None:
+                block = self.rng.standard_gamma(shape, self.block)
+            else:
+                block = special.gammaincinv(shape, self._uniforms())
+            it = self._gamma[shape] = iter(block.tolist())
+            return scale * next(it)
+
+    def exponentials(self, scale=1.0):
+        """
+        Iterador infinit d'exponencials, per exemple per a les arribades
+        """
+        while True:
+            yield self.exponential(scale)
+
+
+class Streams:
+    """
+    Fluxos independents identificats pel nom de la font d'aleatorietat
+
+        streams = Streams(rng)
+        streams["arribades"].exponential(8)
+
+    El flux d'un nom depèn només de la llavor i del nom.
+    `antithetic` es passa a tots els fluxos (vegeu `VariateStream`).
+    """
+
+    def __init__(self, seed=None, block=4096, antithetic=None):
+        self.seed_seq = _seed_sequence(seed)
+        self.block = block
+        self.antithetic = antithetic
+        self._streams = {}
+
+    def seed(self, name):
+        """
+        `SeedSequence` associada al nom
+        """
+        ss = self.seed_seq
+        key = zlib.crc32(name.encode("utf-8"))
+        return np.random.SeedSequence(ss.entropy, spawn_key=ss.spawn_key + (key,))
+
+    def __getitem__(self, name):
+        try:
+            return self._streams[name]
+        except KeyError:
+            stream = VariateStream(self.seed(name), self.block, self.antithetic)
+            self._streams[name] = stream
+            return stream
@@ -0,0 +1,207 @@
+"""
+Motor propi d'esdeveniments per al taller de la Pràctica 8.
+
+Com `JobShop` per a la fàbrica, el taller es simula amb un calendari
+d'esdeveniments (un heap binari de tuples (temps, ordre, tipus, tasca)) en
+lloc d'un procés de simpy per tasca. Les màquines i els operaris són
+comptadors d'unitats lliures i les tasques en espera, dues cues FIFO: les
+reparacions passen davant de les preparacions en ordre estricte, com a
+`ResourceSet(order="priority")`. Tot l'estat són dades, de manera que el
+motor es pot desar amb `pickle` i continuar o ramificar amb `checkpoint`.
+Amb la mateixa llavor dona els mateixos indicadors que `models.taller`.
+"""
+from collections import deque
+from heapq import heappop, heappush
+
+from . import calqueue
+from .monitor import Tally, TimeWeighted
+from .variates import Streams
+
+ARRIBADA = 0
+PREPARADA = 1
+PROCESSADA = 2
+REPARADA = 3
+
+
+class Workshop:
+    """
+    Taller amb màquines i operaris (temps en minuts)
+
+        shop = Workshop(rng=rng)
+        shop.run(7 * 24 * 60)
+        shop.report()
+
+    Cada tasca pren una màquina i un operari per a la preparació, allibera
+    l'operari durant el procés i, si la màquina falla, espera dos operaris
+    per a la reparació. La màquina es reté fins al final. Una tasca és una
+    llista [arribada, preparació, procés, reparació]. Els estadístics són
+    `TimeWeighted` i `Tally` que fan servir el motor com a rellotge (`now`).
+    Amb `calendar=CalendarQueue()` el calendari és una cua de calendari,
+    com a `JobShop`.
+    """
+
+    def __init__(self, n_maquines=5, n_operaris=3, arribades=12, proces=60, preparacio=20,
+                 reparacio=30, p_reparacio=0.2, rng=None, antitetic=None, calendar=None):
+        self.params = dict(arribades=arribades, proces=proces, preparacio=preparacio,
+                           reparacio=reparacio, p_reparacio=p_reparacio)
+        self.streams = Streams(rng, antithetic=antitetic)
+        self.now = 0.0
+        self.events = 0
+        self.maquines = n_maquines
+        self.operaris = n_operaris
+        self.lliures_m = n_maquines
+        self.lliures_o = n_operaris
+        self.preparacions = deque()
+        self.reparacions = deque()
+        self.tasques = 0
+        self.n_reparacions = 0
+        self.cua = TimeWeighted(self, 0)
+        self.espera = Tally()
+        self.us_m = TimeWeighted(self, 0)
+        self.us_o = TimeWeighted(self, 0)
+        # Capacitat al llarg del temps, per si es canvia amb `set_capacity`
+        self.cap_m = TimeWeighted(self, n_maquines)
+        self.cap_o = TimeWeighted(self, n_operaris)
+        self._seq = 0
+        if calendar is None:
+            self.calendar = []
+            self._push, self._pop = heappush, heappop
+        else:
+            self.calendar = calendar
+            self._push, self._pop = calqueue.push, calqueue.pop
+        self._schedule(self.streams["arribades"].exponential(arribades), ARRIBADA, None)
+
+    def _schedule(self, t, kind, task):
+        self._push(self.calendar, (t, self._seq, kind, task))
+        self._seq += 1
+
+    def _dispatch(self):
+        """
+        Concedeix les peticions del capdavant mentre hi caben (reparacions primer)
+        """
+        while True:
+            if self.reparacions:
+                if self.lliures_o < 2:
+                    return
+                task = self.reparacions.popleft()
+                self.lliures_o -= 2
+                self.us_o.add(2)
+                self._schedule(self.now + task[3], REPARADA, task)
+            elif self.preparacions:
+                if self.lliures_m < 1 or self.lliures_o < 1:
+                    return
+                task = self.preparacions.popleft()
+                self.lliures_m -= 1
+                self.lliures_o -= 1
+                self.us_m.add(1)
+                self.us_o.add(1)
+                self.cua.add(-1)
+                self.espera.add(self.now - task[0])
+                self._schedule(self.now + task[1], PREPARADA, task)
+            else:
+                return
+
+    def _release(self, maquines=0, operaris=0):
+        self.lliures_m += maquines
+        self.lliures_o += operaris
+        if maquines:
+            self.us_m.add(-maquines)
+        if operaris:
+            self.us_o.add(-operaris)
+        self._dispatch()
+
+    def set_capacity(self, maquines=None, operaris=None):
+        """
+        Canvia el nombre de màquines o d'operaris a l'instant actual
+
+        Si n'hi ha menys, les unitats ocupades acaben la tasca i no se'n
+        substitueixen.
+        """
+        if maquines is not None:
+            self.lliures_m += maquines - self.maquines
+            self.maquines = maquines
+            self.cap_m.update(maquines)
+        if operaris is not None:
+            self.lliures_o += operaris - self.operaris
+            self.operaris = operaris
+            self.cap_o.update(operaris)
+        self._dispatch()
+
+    def run(self, until):
+        """
+        Processa els esdeveniments anteriors a `until`
+        """
+        calendar = self.calendar
+        streams = self.streams
+        p = self.params
+        pop = self._pop
+        events = 0
+
+        while calendar and calendar[0][0] < until:
+            t, _, kind, task = pop(calendar)
+            self.now = t
+            events += 1
+
+            if kind == ARRIBADA:
+                self._schedule(t + streams["arribades"].exponential(p["arribades"]),
+                               ARRIBADA, None)
+                # Els temps de la tasca es decideixen quan arriba
+                task = [t, streams["preparacio"].exponential(p["preparacio"]),
+                        streams["proces"].exponential(p["proces"]),
+                        streams["reparacio"].exponential(p["reparacio"])]
+                if streams["avaries"].random() >= p["p_reparacio"]:
+                    task[3] = None
+                self.cua.add(1)
+                self.preparacions.append(task)
+                self._dispatch()
+            elif kind == PREPARADA:
+                self._schedule(t + task[2], PROCESSADA, task)
+                self._release(operaris=1)
+            elif kind == PROCESSADA:
+                if task[3] is None:
+                    self.tasques += 1
+                    self._release(maquines=1)
+                else:
+                    self.reparacions.append(task)
+                    self._dispatch()
+            else:
+                self.n_reparacions += 1
+                self.tasques += 1
+                # Primer s'alliberen els operaris i després la màquina, com a `models.taller`
+                self._release(operaris=2)
+                self._release(maquines=1)
+
+        self.events += events
+        self.now = until
+
+    def report(self):
+        """
+        Indicadors fins a l'instant actual, amb el format de `models.taller`
+        """
+        t = self.now
+        cua = self.cua.report(t)
+        return {
+            "cua": cua["mitjana"],
+            "cua_max": cua["max"],
+            "espera": self.espera.mean,
+            "ocupacio_maquines": (self.us_m.report(t)["mitjana"]
+                                  / self.cap_m.report(t)["mitjana"]),
+            "ocupacio_operaris": (self.us_o.report(t)["mitjana"]
+                                  / self.cap_o.report(t)["mitjana"]),
+            "tasques": self.tasques,
+            "reparacions": self.n_reparacions,
+        }
+
+
+def taller(rng, n_maquines=5, n_operaris=3, temps=7 * 24 * 60, arribades=12, proces=60,
+           preparacio=20, reparacio=30, p_reparacio=0.2, antitetic=None, calendari=False):
+    """
+    Taller de la Pràctica 8 amb el motor propi, amb la signatura de `models.taller`
+
+    Amb `calendari=True` es fa servir una cua de calendari.
+    """
+    shop = Workshop(n_maquines, n_operaris, arribades, proces, preparacio, reparacio,
+                    p_reparacio, rng, antitetic,
+                    calqueue.CalendarQueue() if calendari else None)
+    shop.run(temps)
+    return shop.report()